@@ -0,0 +1,106 @@
+from __future__ import annotations
+from functools import lru_cache
+from operator import add, attrgetter, mul, sub
+from typing import Callable, Iterable
+
+from computer import Computer
+
+# Computer attributes that can be used as variables.
+VARIABLES = ("hacking_difficulty", "hacked_value", "risk_factor")
+
+
+def _divide(a: float, b: float) -> float:
+    if b == 0:
+        # If this happen, sth is wrong.
+        raise ValueError("Zero Division.")
+    return a / b
+
+
+OPERATORS = {"+": add, "-": sub, "*": mul, "/": _divide}
+
+
+class RPNExpression:
+    """
+    An expression in reverse polish notation, parsed once into nested functions.
+
+    Tokens are separated by spaces, and are numbers, the operators + - * /,
+    or the names of Computer attributes in VARIABLES, e.g. "hacked_value 2 /".
+    Parts without variables are worked out while parsing.
+    """
+
+    def __init__(self, source: str) -> None:
+        """
+        :complexity: O(T) where T is the number of tokens.
+        :raises ValueError: when the expression is not valid.
+        """
+        self.source = source
+        self.variables: set[str] = set()
+        # Each item is (True, constant) or (False, function of a computer).
+        stack: list[tuple[bool, float | Callable[[Computer], float]]] = []
+
+        for token in source.split():
+            if token in OPERATORS:
+                if len(stack) < 2:
+                    raise ValueError(f"Not enough operands for {token!r} in {source!r}.")
+                b_constant, b = stack.pop()
+                a_constant, a = stack.pop()
+                op = OPERATORS[token]
+                if a_constant and b_constant:
+                    stack.append((True, op(a, b)))
+                else:
+                    stack.append((False, self._combine(op, a_constant, a, b_constant, b)))
+            elif token in VARIABLES:
+                self.variables.add(token)
+                stack.append((False, attrgetter(token)))
+            else:
+                try:
+                    stack.append((True, float(token)))
+                except ValueError:
+                    raise ValueError(f"Unknown token {token!r} in {source!r}.") from None
+
+        if len(stack) != 1:
+            raise ValueError(f"{source!r} should leave exactly one value.")
+        self.is_constant, self._result = stack.pop()
+
+    @staticmethod
+    def _combine(op, a_constant: bool, a, b_constant: bool, b) -> Callable[[Computer], float]:
+        """A function applying op to the two operands, which are constants or functions."""
+        if a_constant:
+            return lambda computer: op(a, b(computer))
+        if b_constant:
+            return lambda computer: op(a(computer), b)
+        return lambda computer: op(a(computer), b(computer))
+
+    def evaluate(self, computer: Computer | None = None) -> float:
+        """
+        The value of the expression, with variables taken from computer.
+
+        :complexity: O(1) without variables, otherwise O(T) where T is the number of tokens.
+        :raises ValueError: when the expression has variables but no computer is given,
+            or divides by zero.
+        """
+        if self.is_constant:
+            return self._result
+        if computer is None:
+            raise ValueError(f"{self.source!r} needs a computer for its variables.")
+        return self._result(computer)
+
+    def evaluate_many(self, computers: Iterable[Computer]) -> list[float]:
+        """
+        The value of the expression for each computer.
+
+        :complexity: O(C * T) where C is the number of computers and T is the number of tokens.
+        """
+        if self.is_constant:
+            return [self._result for _ in computers]
+        return list(map(self._result, computers))
+
+
+@lru_cache(maxsize=None)
+def compile_rpn(source: str) -> RPNExpression:
+    """
+    Returns the expression for source, only parsing each distinct string once.
+
+    :raises ValueError: when the expression is not valid.
+    """
+    return RPNExpression(source)
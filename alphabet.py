@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+
+class Alphabet:
+    """
+    Maps the characters of a key to positions in an InfiniteHashTable.
+
+    A table using an alphabet of `size` positions needs TABLE_SIZE = size + 1,
+    the extra (last) position being for keys that have already ended.
+
+    Keys can be strings, or bytes (whose characters are ints).
+    By default a character goes to the position of its code point, which
+    must then be less than `size`. With `wrap`, the code point is taken
+    modulo `size` instead, so different characters can share a position.
+    With `char_map`, only the characters in the map are allowed.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self, size: int, char_map: dict | None = None, start: int = 0, wrap: bool = False) -> None:
+        """
+        :param start: position of the smallest character, when not using a char_map.
+        :raises ValueError: when char_map uses positions outside the alphabet.
+        """
+        if size <= 0:
+            raise ValueError("Alphabet size should be larger than 0.")
+        self.size = size
+        self.char_map = char_map
+        self.start = start
+        self.wrap = wrap
+
+        if char_map is None:
+            self.order = [(start + i) % size for i in range(size)]
+        else:
+            if any(not 0 <= position < size for position in char_map.values()):
+                raise ValueError("Character map positions should be between 0 and size - 1.")
+            self.order = []
+            seen = set()
+            for char in sorted(char_map):
+                if char_map[char] not in seen:
+                    seen.add(char_map[char])
+                    self.order.append(char_map[char])
+            self.order.extend(position for position in range(size) if position not in seen)
+
+    def length(self, key) -> int:
+        """Number of positions needed to spell out the key."""
+        return len(key)
+
+    def position(self, key, level: int) -> int:
+        """
+        The position of the character at this level of the key.
+
+        :pre: level < self.length(key)
+        :raises ValueError: when the character is not in the alphabet.
+        """
+        char = key[level]
+        if self.char_map is not None:
+            if char not in self.char_map:
+                raise ValueError(f"{char!r} is not in the alphabet.")
+            return self.char_map[char]
+        code = char if isinstance(char, int) else ord(char)
+        if self.wrap:
+            return code % self.size
+        if code >= self.size:
+            raise ValueError(f"{char!r} is not in the alphabet.")
+        return code
+
+    def to_dict(self) -> dict:
+        """A JSON serialisable description, see `from_dict`."""
+        char_map = None
+        if self.char_map is not None:
+            char_map = [[char, position] for char, position in self.char_map.items()]
+        return {"kind": "char", "size": self.size, "char_map": char_map, "start": self.start, "wrap": self.wrap}
+
+    @staticmethod
+    def from_dict(data: dict) -> Alphabet:
+        if data["kind"] == "nibble":
+            return NibbleAlphabet()
+        char_map = None
+        if data["char_map"] is not None:
+            char_map = {char: position for char, position in data["char_map"]}
+        return Alphabet(data["size"], char_map, data["start"], data["wrap"])
+
+
+class NibbleAlphabet(Alphabet):
+    """
+    Splits every character into two positions of 4 bits, high half first.
+
+    Tables only have 17 positions, but keys go twice as deep.
+    Characters must be bytes, so strings should be encoded first (e.g. key.encode()).
+    """
+
+    def __init__(self) -> None:
+        super().__init__(16)
+
+    def length(self, key) -> int:
+        return 2 * len(key)
+
+    def position(self, key, level: int) -> int:
+        char = key[level // 2]
+        code = char if isinstance(char, int) else ord(char)
+        if code >= 256:
+            raise ValueError(f"{char!r} is not in the alphabet.")
+        if level % 2 == 0:
+            return code >> 4
+        return code & 15
+
+    def to_dict(self) -> dict:
+        return {"kind": "nibble"}
+
+
+# Lowercase letters, which keeps the original `ord(char) % 26` layout.
+LOWERCASE = Alphabet(26, start=ord("a") % 26, wrap=True)
+
+# Every byte has its own position, best used with bytes keys (e.g. UTF-8 encoded).
+BYTE = Alphabet(256)
+
+NIBBLE = NibbleAlphabet()
@@ -0,0 +1,62 @@
+from __future__ import annotations
+import asyncio
+from branch_decision import BranchDecision
+from route import Route, RouteSeries, RouteSplit
+
+from typing import TYPE_CHECKING, Iterable
+
+# Avoid circular imports for typing.
+if TYPE_CHECKING:
+    from virus import AsyncVirusType
+
+
+async def afollow_path(route: Route, virus_type: AsyncVirusType) -> None:
+    """
+    Follow a path and add computers according to an async virus_type,
+    awaiting each of its branch decisions. Same path as route.follow_path.
+
+    :complexity: O(P) plus the time of each decision, where P is the length of the path taken.
+    """
+    rest_store_list = [route.store]
+
+    while len(rest_store_list):
+        next_store = rest_store_list.pop()
+
+        if isinstance(next_store, RouteSplit):
+            decision = await virus_type.select_branch(next_store.top, next_store.bottom)
+            rest_store_list.append(next_store.following.store)
+
+            if decision == BranchDecision.TOP:
+                next_store = next_store.top.store
+            elif decision == BranchDecision.BOTTOM:
+                next_store = next_store.bottom.store
+            else:
+                break
+
+        elif isinstance(next_store, RouteSeries):
+            virus_type.add_computer(next_store.computer)
+            next_store = next_store.following.store
+
+        else:
+            next_store = None
+
+        if next_store is not None:
+            rest_store_list.append(next_store)
+
+
+async def afollow_paths(jobs: Iterable[tuple[Route, AsyncVirusType]], limit: int = 16) -> None:
+    """
+    Awaits afollow_path(route, virus_type) for each (route, virus_type) job
+    on the running event loop, with at most `limit` of them following at once.
+
+    :raises ValueError: when limit is below 1.
+    """
+    if limit < 1:
+        raise ValueError("Limit should be at least 1.")
+    semaphore = asyncio.Semaphore(limit)
+
+    async def follow(route: Route, virus_type: AsyncVirusType) -> None:
+        async with semaphore:
+            await afollow_path(route, virus_type)
+
+    await asyncio.gather(*(follow(route, virus_type) for route, virus_type in jobs))
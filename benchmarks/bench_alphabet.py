@@ -0,0 +1,105 @@
+"""
+Compares InfiniteHashTable alphabets on real-world keys.
+
+For each corpus and alphabet, reports the memory used to build the table,
+the number of tables, and the average/maximum number of levels a lookup walks.
+
+Usage: python -m benchmarks.bench_alphabet
+"""
+from __future__ import annotations
+import os
+import re
+import string
+import sys
+import sysconfig
+import time
+import tracemalloc
+
+from alphabet import Alphabet, LOWERCASE, BYTE, NIBBLE
+from infinite_hash_table import InfiniteHashTable
+
+PRINTABLE = Alphabet(len(string.printable), {char: i for i, char in enumerate(string.printable)})
+
+
+def load_corpora() -> dict[str, list[str]]:
+    """Keys taken from the Python standard library installed here."""
+    root = sysconfig.get_paths()["stdlib"]
+    paths = []
+    identifiers = set()
+    unicode_words = set()
+    for directory, _, files in os.walk(root):
+        for file in files:
+            if not file.endswith(".py"):
+                continue
+            path = os.path.join(directory, file)
+            paths.append(os.path.relpath(path, root).replace(os.sep, "/"))
+            try:
+                with open(path, encoding="utf-8") as f:
+                    words = re.findall(r"\w+", f.read())
+            except (UnicodeDecodeError, OSError):
+                continue
+            for word in words:
+                if word.isascii():
+                    identifiers.add(word)
+                else:
+                    unicode_words.add(word)
+    return {
+        "stdlib paths": sorted(paths),
+        "identifiers": sorted(identifiers),
+        "utf-8 words": sorted(unicode_words),
+    }
+
+
+def measure(alphabet: Alphabet, keys: list) -> tuple[int, int, float, int, float]:
+    """
+    Returns the memory (bytes), number of tables, average and maximum lookup depth,
+    and the time taken to look up every key.
+
+    :raises ValueError: when the keys can't be stored with this alphabet.
+    """
+    table_type = InfiniteHashTable.with_alphabet(alphabet)
+    tracemalloc.start()
+    table = table_type.from_sorted((key, i) for i, key in enumerate(keys))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tables = 0
+    stack = [table]
+    while stack:
+        current = stack.pop()
+        tables += 1
+        for item in current.array:
+            if current._is_table(item):
+                stack.append(item[1])
+
+    start = time.perf_counter()
+    depths = [len(table.get_location(key)) for key in keys]
+    elapsed = time.perf_counter() - start
+    return memory, tables, sum(depths) / len(depths), max(depths), elapsed
+
+
+def main() -> None:
+    alphabets = [
+        ("lowercase (26)", LOWERCASE, False),
+        ("printable (100)", PRINTABLE, False),
+        ("byte (256)", BYTE, True),
+        ("nibble (16)", NIBBLE, True),
+    ]
+    print(f"{'corpus':<14} {'alphabet':<16} {'keys':>6} {'memory KiB':>11} {'tables':>7} {'avg depth':>9} {'max':>4} {'lookup ms':>9}")
+    for corpus, keys in load_corpora().items():
+        for name, alphabet, encode in alphabets:
+            corpus_keys = sorted(key.encode() for key in keys) if encode else keys
+            try:
+                memory, tables, average, deepest, elapsed = measure(alphabet, corpus_keys)
+            except ValueError as e:
+                print(f"{corpus:<14} {name:<16} {len(keys):>6} {'n/a: ' + str(e)[:60]}")
+                continue
+            print(
+                f"{corpus:<14} {name:<16} {len(keys):>6} {memory / 1024:>11.0f} {tables:>7}"
+                f" {average:>9.2f} {deepest:>4} {elapsed * 1000:>9.1f}"
+            )
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compares InfiniteHashTable.get_many against calling __getitem__ for each key.
+
+Keys are the relative paths of files in the Python standard library,
+looked up in batches of 10K (with repeats if there are fewer files).
+
+Usage: python -m benchmarks.bench_batch_lookup
+"""
+from __future__ import annotations
+import os
+import random
+import sysconfig
+import time
+
+from alphabet import BYTE
+from infinite_hash_table import InfiniteHashTable
+
+BATCH_SIZE = 10_000
+REPEATS = 5
+
+
+def main() -> None:
+    root = sysconfig.get_paths()["stdlib"]
+    paths = set()
+    for directory, _, files in os.walk(root):
+        for file in files:
+            paths.add(os.path.relpath(os.path.join(directory, file), root))
+    paths = sorted(paths)
+    table = InfiniteHashTable.with_alphabet(BYTE).from_sorted((path, i) for i, path in enumerate(paths))
+
+    random.seed(1008)
+    batch = [random.choice(paths) for _ in range(BATCH_SIZE)]
+
+    loop_time = batch_time = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        expected = [table[key] for key in batch]
+        middle = time.perf_counter()
+        result = table.get_many(batch)
+        end = time.perf_counter()
+        assert result == expected
+        loop_time = min(loop_time, middle - start)
+        batch_time = min(batch_time, end - middle)
+
+    print(f"{len(paths)} keys, batches of {BATCH_SIZE}")
+    print(f"__getitem__ loop: {loop_time * 1000:8.1f} ms")
+    print(f"get_many:         {batch_time * 1000:8.1f} ms ({loop_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Compares monte_carlo.simulate_trials against following the route once per trial.
+
+Usage: python -m benchmarks.bench_monte_carlo
+"""
+from __future__ import annotations
+import time
+
+from benchmarks.routes import random_route
+from monte_carlo import simulate_trials
+from virus import ProbabilisticVirus
+
+ROUTE_SIZE = 2_000
+TRIALS = 20_000
+
+
+def main() -> None:
+    route = random_route(ROUTE_SIZE, seed=1)
+    compiled = route.compile()
+    print(f"{TRIALS} trials over a route of {ROUTE_SIZE} nodes")
+
+    start = time.perf_counter()
+    total = 0
+    virus = ProbabilisticVirus(0.45, 0.45, seed=1)
+    for _ in range(TRIALS):
+        virus.computers = []
+        compiled.follow_path(virus)
+        total += sum(computer.hacked_value for computer in virus.computers)
+    elapsed = time.perf_counter() - start
+    print(f"{'one trial at a time':<28} {elapsed * 1000:9.1f} ms  mean {total / TRIALS:.2f}")
+
+    start = time.perf_counter()
+    result = simulate_trials(compiled, virus, TRIALS, seed=1)
+    elapsed = time.perf_counter() - start
+    print(f"{'simulate_trials':<28} {elapsed * 1000:9.1f} ms  mean {result.mean():.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Compares ways of following a route with every virus type many times.
+
+Usage: python -m benchmarks.bench_route_traversal
+"""
+from __future__ import annotations
+import time
+
+from benchmarks.routes import random_route
+from virus import TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus
+
+VIRUS_TYPES = [TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus]
+ROUTE_SIZE = 20_000
+RUNS = 200
+
+
+def timed(name: str, func) -> float:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed * 1000:9.1f} ms")
+    return elapsed
+
+
+def main() -> None:
+    route = random_route(ROUTE_SIZE, seed=1)
+    viruses = [virus_type() for _ in range(RUNS // len(VIRUS_TYPES)) for virus_type in VIRUS_TYPES]
+    print(f"{len(viruses)} viruses over a route of {ROUTE_SIZE} nodes")
+
+    def follow_each() -> None:
+        for virus in viruses:
+            route.follow_path(virus)
+
+    def compiled() -> None:
+        plan = route.compile()
+        for virus in viruses:
+            plan.follow_path(virus)
+
+    def fleet() -> None:
+        route.follow_paths(viruses)
+
+    timed("Route.follow_path", follow_each)
+    timed("Route.compile + follow_path", compiled)
+    timed("Route.follow_paths", fleet)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Times route_simulation.simulate over many generated routes with 2, 4... processes,
+up to the number of CPUs (at least 2), against following every route in a plain loop.
+Also times what simulate does in this process alone for each result sent back:
+replaying the decisions of forked workers, or looking up the computer indices of packed routes.
+With AggregateSink as the sink type there is nothing left to do per result.
+
+Usage: python -m benchmarks.bench_simulation
+"""
+from __future__ import annotations
+import os
+import time
+
+from benchmarks.routes import random_route
+from result_sinks import AggregateSink
+from route_simulation import _Recorder, _replay, pack_route, simulate
+from virus import TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus
+
+VIRUS_TYPES = [TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus]
+ROUTES = 2000
+ROUTE_SIZE = 500
+
+
+def main() -> None:
+    routes = [random_route(ROUTE_SIZE, seed=i) for i in range(ROUTES)]
+    print(f"{ROUTES} routes of {ROUTE_SIZE} computers, {len(VIRUS_TYPES)} virus types")
+
+    start = time.perf_counter()
+    expected = simulate(routes, VIRUS_TYPES, processes=1)
+    base = time.perf_counter() - start
+    print(f"{'follow_path loop':<20} {base * 1000:9.1f} ms")
+
+    decisions = []
+    indices = []
+    tables = []
+    for route in routes:
+        table = pack_route(route)[1]
+        slots = {id(computer): i for i, computer in enumerate(table)}
+        tables.append(table)
+        decisions.append([])
+        indices.append([])
+        for virus_type in VIRUS_TYPES:
+            recorder = _Recorder(virus_type())
+            route.follow_path(recorder)
+            decisions[-1].append(bytes(recorder.decisions))
+            recorder = _Recorder(virus_type(), slots)
+            route.follow_path(recorder)
+            indices[-1].append(recorder.indices)
+
+    start = time.perf_counter()
+    for route, route_decisions in zip(routes, decisions):
+        for virus_decisions in route_decisions:
+            _replay(route, virus_decisions)
+    elapsed = time.perf_counter() - start
+    print(f"{'replay (fork)':<20} {elapsed * 1000:9.1f} ms ({elapsed / base:.2f} of the loop)")
+
+    start = time.perf_counter()
+    for table, route_indices in zip(tables, indices):
+        for virus_indices in route_indices:
+            list(map(table.__getitem__, virus_indices))
+    elapsed = time.perf_counter() - start
+    print(f"{'lookup (packed)':<20} {elapsed * 1000:9.1f} ms ({elapsed / base:.2f} of the loop)")
+
+    processes = 2
+    while processes <= max(2, os.cpu_count() or 1):
+        start = time.perf_counter()
+        results = simulate(routes, VIRUS_TYPES, processes=processes)
+        elapsed = time.perf_counter() - start
+        assert results == expected
+        print(f"{f'{processes} processes':<20} {elapsed * 1000:9.1f} ms ({base / elapsed:.2f}x)")
+        start = time.perf_counter()
+        simulate(routes, VIRUS_TYPES, processes=processes, sink_type=AggregateSink)
+        elapsed = time.perf_counter() - start
+        print(f"{f'{processes} (aggregate)':<20} {elapsed * 1000:9.1f} ms ({base / elapsed:.2f}x)")
+        processes *= 2
+
+
+if __name__ == "__main__":
+    main()
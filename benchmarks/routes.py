@@ -0,0 +1,39 @@
+"""Random routes for the route benchmarks."""
+from __future__ import annotations
+import random
+
+from computer import Computer
+from route import Route, RouteSplit
+
+
+def random_computer(rng: random.Random, name: str) -> Computer:
+    return Computer(name, rng.randint(0, 10), rng.randint(0, 20), rng.choice([0.0, 0.1, 0.5, 1.0, 2.0]))
+
+
+def random_route(size: int, seed: int = 0, split_chance: float = 0.3, branch_length: int = 4) -> Route:
+    """
+    A random route with about `size` computers along a main path.
+    Splits along the way have short branches of up to `branch_length` computers
+    (and sometimes a nested split), then rejoin the main path.
+
+    Built from the end backwards, so without recursion.
+    """
+    rng = random.Random(seed)
+    route = Route(None)
+    count = 0
+    while count < size:
+        if rng.random() < split_chance:
+            branches = []
+            for _ in range(2):
+                branch = Route(None)
+                if rng.random() < 0.2:
+                    branch = branch.add_empty_branch_before()
+                for _ in range(rng.randint(0, branch_length)):
+                    branch = branch.add_computer_before(random_computer(rng, f"c{count}"))
+                    count += 1
+                branches.append(branch)
+            route = Route(RouteSplit(branches[0], branches[1], route))
+        else:
+            route = route.add_computer_before(random_computer(rng, f"c{count}"))
+            count += 1
+    return route
@@ -0,0 +1,266 @@
+from __future__ import annotations
+from array import array
+from branch_decision import BranchDecision
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit
+
+from typing import TYPE_CHECKING, Iterator
+
+# Avoid circular imports for typing.
+if TYPE_CHECKING:
+    from virus import VirusType
+
+# Opcodes.
+COMPUTER = 0    # Add computers[arg] to the virus.
+SPLIT = 1       # Ask the virus about split number arg.
+RETURN = 2      # End of a branch, continue with whatever follows the split.
+JUMP = 3        # Continue from instruction arg, a route that was already laid out.
+
+
+class CompiledRoute:
+    """
+    A route flattened into an instruction array, made with Route.compile().
+
+    Each route is laid out as a block of instructions ending with RETURN.
+    A split is followed directly by its following route, while its top and
+    bottom routes are blocks elsewhere. Taking a branch jumps to its block,
+    remembering to come back to the instruction after the split.
+    A route shared by several others is laid out once, and reached with JUMP.
+
+        - ops, args:        The opcode and argument of each instruction.
+        - computers:        Computers added by COMPUTER instructions.
+        - tops, bottoms:    Branches of each split, passed to select_branch.
+        - top_targets, bottom_targets:  Where each branch's block starts.
+
+    Routes should not be changed after being compiled.
+    """
+
+    def __init__(self, route: Route) -> None:
+        """
+        :complexity: O(N) where N is the number of distinct nodes in the route.
+        """
+        self.ops = array("b")
+        self.args = array("q")
+        self.computers: list[Computer] = []
+        self.tops: list[Route] = []
+        self.bottoms: list[Route] = []
+        self.top_targets = array("q")
+        self.bottom_targets = array("q")
+
+        # Where each route's instructions start (by id), so routes shared
+        # by several others are only laid out once.
+        starts: dict[int, int] = {}
+        # Routes still to be laid out, and which split target (if any) to point at them.
+        pending: list[tuple[Route, array | None, int]] = [(route, None, 0)]
+        while pending:
+            current, targets, split = pending.pop()
+            start = len(self.ops)
+            if targets is not None:
+                targets[split] = starts.get(id(current), start)
+
+            while id(current) not in starts:
+                starts[id(current)] = len(self.ops)
+                store = current.store
+                if isinstance(store, RouteSeries):
+                    self.ops.append(COMPUTER)
+                    self.args.append(len(self.computers))
+                    self.computers.append(store.computer)
+                elif isinstance(store, RouteSplit):
+                    index = len(self.tops)
+                    self.ops.append(SPLIT)
+                    self.args.append(index)
+                    self.tops.append(store.top)
+                    self.bottoms.append(store.bottom)
+                    self.top_targets.append(-1)
+                    self.bottom_targets.append(-1)
+                    pending.append((store.bottom, self.bottom_targets, index))
+                    pending.append((store.top, self.top_targets, index))
+                else:
+                    self.ops.append(RETURN)
+                    self.args.append(0)
+                    break
+                current = store.following
+            else:
+                # Ran into a route laid out before, unless the target already points at it.
+                if len(self.ops) > start:
+                    self.ops.append(JUMP)
+                    self.args.append(starts[id(current)])
+
+    def __len__(self) -> int:
+        """Number of instructions."""
+        return len(self.ops)
+
+    def stepper(self, virus_type: VirusType) -> RouteStepper:
+        """A RouteStepper following a path for virus_type a few instructions at a time."""
+        return RouteStepper(self, virus_type)
+
+    def follow_path(self, virus_type: VirusType) -> None:
+        """
+        Follow a path and add computers according to a virus_type.
+        Same as Route.follow_path on the compiled route.
+
+        :complexity: O(P) where P is the length of the path taken.
+        """
+        ops = self.ops
+        args = self.args
+        computers = self.computers
+        tops = self.tops
+        bottoms = self.bottoms
+        top_targets = self.top_targets
+        bottom_targets = self.bottom_targets
+        add_computer = virus_type.add_computer
+        select_branch = virus_type.select_branch
+        top = BranchDecision.TOP
+        bottom = BranchDecision.BOTTOM
+
+        returns = []
+        pc = 0
+        while True:
+            op = ops[pc]
+            if op == COMPUTER:
+                add_computer(computers[args[pc]])
+                pc += 1
+            elif op == SPLIT:
+                split = args[pc]
+                decision = select_branch(tops[split], bottoms[split])
+                if decision == top:
+                    returns.append(pc + 1)
+                    pc = top_targets[split]
+                elif decision == bottom:
+                    returns.append(pc + 1)
+                    pc = bottom_targets[split]
+                else:
+                    return
+            elif op == JUMP:
+                pc = args[pc]
+            elif returns:
+                pc = returns.pop()
+            else:
+                return
+
+
+class RouteStepper:
+    """
+    Follows a path on a compiled route like CompiledRoute.follow_path,
+    but only a given number of instructions per call to step, so a long
+    traversal can be paused, interleaved with other work, or checkpointed.
+
+    The whole progress is in `state()`: the next instruction, the return stack,
+    which computers were added and what was decided at each split. It can be saved
+    as JSON and later passed to `from_state` with the same route compiled again
+    (compiling a route always gives the same instructions), which adds the saved
+    computers to the new virus and carries on without asking it about the splits
+    already decided. Those are passed to the virus's skip_branches instead, so a
+    virus whose decisions depend on the ones before (e.g. OptimalVirus, or the
+    random draws of ProbabilisticVirus) can catch up.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self, compiled: CompiledRoute, virus_type: VirusType) -> None:
+        self.compiled = compiled
+        self.virus_type = virus_type
+        # The next instruction, or -1 when the path has ended.
+        self.pc = 0
+        self.returns: list[int] = []
+        # Indices in compiled.computers of the computers added so far.
+        self.added: list[int] = []
+        # (split, decision value) of each split decided so far.
+        self.decided: list[tuple[int, int]] = []
+
+    @property
+    def done(self) -> bool:
+        return self.pc < 0
+
+    def step(self, budget: int = 1) -> bool:
+        """
+        Runs at most `budget` instructions, returns whether the path has more to follow.
+
+        :complexity: O(budget)
+        """
+        ops = self.compiled.ops
+        args = self.compiled.args
+        virus_type = self.virus_type
+        pc = self.pc
+        returns = self.returns
+
+        while budget > 0 and pc >= 0:
+            budget -= 1
+            op = ops[pc]
+            if op == COMPUTER:
+                self.added.append(args[pc])
+                virus_type.add_computer(self.compiled.computers[args[pc]])
+                pc += 1
+            elif op == SPLIT:
+                split = args[pc]
+                decision = virus_type.select_branch(self.compiled.tops[split], self.compiled.bottoms[split])
+                self.decided.append((split, decision.value))
+                if decision == BranchDecision.TOP:
+                    returns.append(pc + 1)
+                    pc = self.compiled.top_targets[split]
+                elif decision == BranchDecision.BOTTOM:
+                    returns.append(pc + 1)
+                    pc = self.compiled.bottom_targets[split]
+                else:
+                    pc = -1
+            elif op == JUMP:
+                pc = args[pc]
+            elif returns:
+                pc = returns.pop()
+            else:
+                pc = -1
+
+        self.pc = pc
+        return pc >= 0
+
+    def iter_steps(self, budget: int = 1) -> Iterator[RouteStepper]:
+        """
+        Yields this stepper after every `budget` instructions, until the path has ended.
+
+        :complexity: O(P) over the whole iteration, where P is the length of the path.
+        """
+        while self.step(budget):
+            yield self
+
+    def run(self) -> None:
+        """Follows the rest of the path."""
+        while self.step(1 << 16):
+            pass
+
+    def state(self) -> dict:
+        """
+        A JSON serialisable copy of the progress.
+
+        :complexity: O(R + A + D) for R pending returns, A computers added and D splits decided.
+        """
+        return {
+            "instructions": len(self.compiled),
+            "pc": self.pc,
+            "returns": list(self.returns),
+            "added": list(self.added),
+            "decided": [list(decided) for decided in self.decided],
+        }
+
+    @classmethod
+    def from_state(cls, compiled: CompiledRoute, virus_type: VirusType, state: dict) -> RouteStepper:
+        """
+        A stepper carrying on from a saved state, with the computers it
+        had added already added to virus_type, and the splits it had decided
+        passed to virus_type.skip_branches.
+
+        :complexity: O(R + A + D) for R pending returns, A computers added and D splits decided.
+        :raises ValueError: when the state is from a different route.
+        """
+        if state["instructions"] != len(compiled) or state["pc"] >= len(compiled):
+            raise ValueError("The state is not from this route.")
+        stepper = cls(compiled, virus_type)
+        stepper.pc = state["pc"]
+        stepper.returns = list(state["returns"])
+        stepper.added = list(state["added"])
+        stepper.decided = [(split, value) for split, value in state["decided"]]
+        for index in stepper.added:
+            virus_type.add_computer(compiled.computers[index])
+        virus_type.skip_branches([
+            (compiled.tops[split], compiled.bottoms[split], BranchDecision(value)) for split, value in stepper.decided
+        ])
+        return stepper
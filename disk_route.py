@@ -0,0 +1,186 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+import json
+import struct
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit, RouteStore
+
+from typing import BinaryIO
+
+# The last bytes of a route file: where the index starts, and the number of nodes.
+TRAILER = struct.Struct("<qq")
+FILE_HEADER = b'{"format":"route-file","version":1}\n'
+
+
+def write_route_file(route: Route, path: str) -> int:
+    """
+    Writes the route to a file which RouteFile can load one node at a time.
+
+    Nodes are numbered as they are found, the given route being node 0,
+    and each is written as a JSON line which refers to its children by number.
+    After them comes the index, the offset of each node's line, then the trailer.
+    Routes shared by several others are only written once.
+
+    Returns the number of nodes written.
+
+    :complexity: O(N) where N is the number of distinct nodes in the route.
+    """
+    node_ids = {id(route): 0}
+    offsets = array("q", [0])
+    stack = [route]
+
+    with open(path, "wb") as fp:
+        fp.write(FILE_HEADER)
+        while len(stack):
+            current = stack.pop()
+            store = current.store
+
+            if isinstance(store, RouteSplit):
+                children = [store.top, store.bottom, store.following]
+            elif isinstance(store, RouteSeries):
+                children = [store.following]
+            else:
+                children = []
+            child_ids = []
+            for child in children:
+                if id(child) not in node_ids:
+                    node_ids[id(child)] = len(offsets)
+                    offsets.append(0)
+                    stack.append(child)
+                child_ids.append(node_ids[id(child)])
+
+            if isinstance(store, RouteSplit):
+                record = ["split", *child_ids]
+            elif isinstance(store, RouteSeries):
+                computer = store.computer
+                fields = [computer.name, computer.hacking_difficulty, computer.hacked_value, computer.risk_factor]
+                record = ["series", fields, *child_ids]
+            else:
+                record = ["empty"]
+            offsets[node_ids[id(current)]] = fp.tell()
+            fp.write(json.dumps(record, separators=(",", ":")).encode() + b"\n")
+
+        index_offset = fp.tell()
+        offsets.tofile(fp)
+        fp.write(TRAILER.pack(index_offset, len(offsets)))
+
+    return len(offsets)
+
+
+class RouteFile:
+    """
+    A route file written by write_route_file, opened for reading nodes on demand.
+
+    `root` is the route that was written, as a LazyRoute. The stores of lazy
+    routes are read from the file when first asked for, and the most recently
+    used `cache_size` of them are kept, so following a path only reads the
+    nodes on it and holds at most `cache_size` nodes in memory.
+    A store read again after leaving the cache has new Computer objects, equal to the old ones,
+    but there is only ever one LazyRoute for each node, so tables keyed by the id of a
+    route (as compile and OptimalVirus use) stay right however small the cache is.
+    The lazy routes made are kept, a few dozen bytes each, for as long as the file is open.
+
+        - loads:    Number of times a node was read from the file.
+
+    Should be closed after use, or used as a context manager.
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self, path: str, cache_size: int = 1024) -> None:
+        """
+        :raises ValueError: when the file is not a route file, or cache_size is below 1.
+        """
+        if cache_size < 1:
+            raise ValueError("Cache size should be at least 1.")
+        self.cache_size = cache_size
+        self.loads = 0
+        self._cache: OrderedDict[int, RouteStore] = OrderedDict()
+        self._routes: dict[int, LazyRoute] = {}
+        self._fp: BinaryIO = open(path, "rb")
+
+        if self._fp.readline() != FILE_HEADER:
+            self._fp.close()
+            raise ValueError(f"{path} is not a route file.")
+        self._fp.seek(-TRAILER.size, 2)
+        self._index_offset, self._node_count = TRAILER.unpack(self._fp.read(TRAILER.size))
+        self.root = self.route(0)
+
+    def __len__(self) -> int:
+        """Number of nodes in the file."""
+        return self._node_count
+
+    def route(self, node_id: int) -> LazyRoute:
+        """The LazyRoute of a node, the same object every time it is asked for."""
+        if node_id not in self._routes:
+            self._routes[node_id] = LazyRoute(self, node_id)
+        return self._routes[node_id]
+
+    def node(self, node_id: int) -> RouteStore:
+        """
+        The store of a node, from the cache or else read from the file.
+
+        :complexity: O(L) where L is the length of the node's line, when it's not cached.
+        :raises IndexError: when there is no such node.
+        """
+        if node_id in self._cache:
+            self._cache.move_to_end(node_id)
+            return self._cache[node_id]
+        if not 0 <= node_id < self._node_count:
+            raise IndexError(f"No node {node_id} in the route file.")
+
+        self._fp.seek(self._index_offset + 8 * node_id)
+        offset = array("q", self._fp.read(8))[0]
+        self._fp.seek(offset)
+        record = json.loads(self._fp.readline())
+        self.loads += 1
+
+        if record[0] == "split":
+            store = RouteSplit(self.route(record[1]), self.route(record[2]), self.route(record[3]))
+        elif record[0] == "series":
+            store = RouteSeries(Computer(*record[1]), self.route(record[2]))
+        else:
+            store = None
+
+        self._cache[node_id] = store
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return store
+
+    def resident(self) -> int:
+        """Number of nodes currently held in the cache."""
+        return len(self._cache)
+
+    def close(self) -> None:
+        self._cache.clear()
+        self._routes.clear()
+        self._fp.close()
+
+    def __enter__(self) -> RouteFile:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class LazyRoute(Route):
+    """
+    A Route whose store is read from a RouteFile when it is asked for.
+    It can be used anywhere a Route can, but can't be changed.
+    Made by RouteFile.route, so there is one for each node of the file.
+    """
+
+    def __init__(self, route_file: RouteFile, node_id: int) -> None:
+        self.route_file = route_file
+        self.node_id = node_id
+
+    @property
+    def store(self) -> RouteStore:
+        return self.route_file.node(self.node_id)
+
+    @store.setter
+    def store(self, value: RouteStore) -> None:
+        raise AttributeError("Lazy routes can't be changed.")
+
+    def __repr__(self) -> str:
+        return f"LazyRoute(node_id={self.node_id})"
@@ -1,12 +1,30 @@
 from __future__ import annotations
-from typing import Generic, TypeVar
+from array import array
+from bisect import bisect_left
+from typing import Generic, TypeVar, Iterable, Iterator
+import json
+import sys
 
+from alphabet import Alphabet, LOWERCASE
 from data_structures.referential_array import ArrayR
 
 K = TypeVar("K")
 V = TypeVar("V")
 
 
+def _common_prefix_length(first: K, second: K) -> int:
+    """
+    Length of the longest common prefix of two keys.
+
+    :complexity: O(n) where n is the length of the prefix.
+    """
+    length = min(len(first), len(second))
+    i = 0
+    while i < length and first[i] == second[i]:
+        i += 1
+    return i
+
+
 class InfiniteHashTable(Generic[K, V]):
     """
     Infinite Hash Table.
@@ -16,45 +34,155 @@ class InfiniteHashTable(Generic[K, V]):
                 Otherwise `hash` should be overwritten.
         - V:    Value Type.
 
+    Characters are placed according to ALPHABET, see `with_alphabet`.
+
     Unless stated otherwise, all methods have O(1) complexity.
     """
 
+    ALPHABET: Alphabet = LOWERCASE
     TABLE_SIZE = 27
 
     def __init__(self, level: int = 0) -> None:
+        """
+        :raises ValueError: when TABLE_SIZE doesn't match the size of ALPHABET.
+        """
+        if self.TABLE_SIZE != self.ALPHABET.size + 1:
+            raise ValueError("TABLE_SIZE should be one more than the size of ALPHABET.")
         self.array: ArrayR[tuple[K, V] | None] = ArrayR(self.TABLE_SIZE)
         self.count = 0
         self.level = level
     
     def hash(self, key: K) -> int:
-        if self.level < len(key):
-            return ord(key[self.level]) % (self.TABLE_SIZE-1)
+        if self.level < self.ALPHABET.length(key):
+            return self.ALPHABET.position(key, self.level)
         return self.TABLE_SIZE-1
 
+    @classmethod
+    def with_alphabet(cls, alphabet: Alphabet) -> type[InfiniteHashTable]:
+        """
+        Returns a subclass of this table using the given alphabet,
+        e.g. InfiniteHashTable.with_alphabet(BYTE)().
+        """
+        return type(cls.__name__, (cls,), {"ALPHABET": alphabet, "TABLE_SIZE": alphabet.size + 1})
+
+    def _is_table(self, item: tuple[K, V] | None) -> bool:
+        """Whether an entry of the array is a lower level table rather than a (key, value) pair."""
+        return item is not None and isinstance(item[1], InfiniteHashTable)
+
+    def _new_table(self) -> InfiniteHashTable[K, V]:
+        """Create an empty table one level below this one."""
+        return type(self)(self.level + 1)
+
     def __getitem__(self, key: K) -> V:
         """
         Get the value at a certain key
 
+        :complexity: O(len(key))
         :raises KeyError: when the key doesn't exist.
         """
-        raise NotImplementedError()
+        table = self
+        while True:
+            item = table.array[table.hash(key)]
+            if item is None:
+                raise KeyError(key)
+            if table._is_table(item):
+                table = item[1]
+            elif item[0] == key:
+                return item[1]
+            else:
+                raise KeyError(key)
 
     def __setitem__(self, key: K, value: V) -> None:
         """
         Set an (key, value) pair in our hash table.
+
+        :complexity: O(len(key))
+        :raises ValueError: when a character of the key is not in the alphabet,
+        or two keys have the same positions at every level. The table is left unchanged.
         """
-        raise NotImplementedError()
+        # Check the whole key first, as a collision moves an existing key before reaching the end.
+        for level in range(self.level, self.ALPHABET.length(key)):
+            self.ALPHABET.position(key, level)
+
+        path = []
+        table = self
+        while True:
+            position = table.hash(key)
+            item = table.array[position]
+            if not table._is_table(item):
+                break
+            path.append(table)
+            table = item[1]
+
+        if item is not None and item[0] == key:
+            table.array[position] = (key, value)
+            return
+
+        path.append(table)
+        if item is not None:
+            # Collision with a different key, push both down until they separate.
+            first_table, first_position = table, position
+            while True:
+                sub_table = table._new_table()
+                table.array[position] = (key, sub_table)
+                sub_table.count = 1
+                table = sub_table
+                position = table.hash(key)
+                other_position = table.hash(item[0])
+                if position != other_position:
+                    table.array[other_position] = item
+                    break
+                if position == self.TABLE_SIZE - 1:
+                    # Both keys have ended, the alphabet can't tell them apart.
+                    first_table.array[first_position] = item
+                    raise ValueError(f"{key!r} and {item[0]!r} have the same positions at every level.")
+                path.append(table)
+            path.append(table)
+        table.array[position] = (key, value)
+
+        for table in path:
+            table.count += 1
 
     def __delitem__(self, key: K) -> None:
         """
         Deletes a (key, value) pair in our hash table.
 
+        If a lower level table is left with a single (key, value) pair,
+        that pair is moved back up, as far as it can go.
+
+        :complexity: O(len(key))
         :raises KeyError: when the key doesn't exist.
         """
-        raise NotImplementedError()
+        path = []
+        table = self
+        while True:
+            position = table.hash(key)
+            item = table.array[position]
+            if item is None:
+                raise KeyError(key)
+            path.append((table, position))
+            if not table._is_table(item):
+                break
+            table = item[1]
+        if item[0] != key:
+            raise KeyError(key)
+
+        table.array[position] = None
+        for table, _ in path:
+            table.count -= 1
+
+        # Collapse from the bottom up.
+        for i in range(len(path) - 2, -1, -1):
+            table, position = path[i]
+            sub_table = path[i + 1][0]
+            if len(sub_table) != 1:
+                break
+            for sub_item in sub_table.array:
+                if sub_item is not None:
+                    table.array[position] = sub_item
 
     def __len__(self) -> int:
-        raise NotImplementedError()
+        return self.count
 
     def __str__(self) -> str:
         """
@@ -62,31 +190,442 @@ class InfiniteHashTable(Generic[K, V]):
 
         Not required but may be a good testing tool.
         """
-        raise NotImplementedError()
+        result = ""
+        stack = [(self, 0)]
+        while stack:
+            table, position = stack.pop()
+            while position < table.TABLE_SIZE:
+                item = table.array[position]
+                position += 1
+                if item is None:
+                    continue
+                indent = "  " * table.level + str(position - 1) + ": "
+                if table._is_table(item):
+                    result += indent + str(item[0][:table.level + 1]) + "\n"
+                    stack.append((table, position))
+                    stack.append((item[1], 0))
+                    break
+                result += indent + "(" + str(item[0]) + "," + str(item[1]) + ")\n"
+        return result
 
     def get_location(self, key) -> list[int]:
         """
         Get the sequence of positions required to access this key.
 
+        :complexity: O(len(key))
         :raises KeyError: when the key doesn't exist.
         """
-        raise NotImplementedError()
+        locations = []
+        table = self
+        while True:
+            position = table.hash(key)
+            item = table.array[position]
+            if item is None:
+                raise KeyError(key)
+            locations.append(position)
+            if table._is_table(item):
+                table = item[1]
+            elif item[0] == key:
+                return locations
+            else:
+                raise KeyError(key)
+
+    def _walk_many(self, keys: list[K]) -> list[tuple[list[int], tuple[K, V] | None]]:
+        """
+        For each key, the positions walked through and the (key, value) pair found at the end.
+
+        Keys are visited in sorted order, so each key starts from the table
+        where it stops sharing a prefix with the previous key, instead of the top.
+        Relies on ALPHABET, so should be overwritten along with `hash`.
+        """
+        results: list = [None] * len(keys)
+        tables = [self]
+        positions: list[int] = []
+        previous = None
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            if previous is not None:
+                shared = self.ALPHABET.length(key[:_common_prefix_length(previous, key)])
+                shared = min(shared, len(positions) - 1)
+                del tables[shared + 1:]
+                del positions[shared:]
+            table = tables[-1]
+            while True:
+                position = table.hash(key)
+                item = table.array[position]
+                positions.append(position)
+                if not table._is_table(item):
+                    break
+                table = item[1]
+                tables.append(table)
+            results[i] = (list(positions), item)
+            previous = key
+        return results
+
+    def get_many(self, keys: list[K]) -> list[V]:
+        """
+        Get the values of many keys at once, in the same order as keys.
+
+        :complexity: O(K log K + L) where K is the number of keys
+        and L is the total length of the keys not shared with the previous sorted key.
+        :raises KeyError: when a key doesn't exist.
+        """
+        values = []
+        for key, (_, item) in zip(keys, self._walk_many(keys)):
+            if item is None or item[0] != key:
+                raise KeyError(key)
+            values.append(item[1])
+        return values
+
+    def get_location_many(self, keys: list[K]) -> list[list[int]]:
+        """
+        get_location for many keys at once, in the same order as keys.
+
+        :complexity: See get_many.
+        :raises KeyError: when a key doesn't exist.
+        """
+        locations = []
+        for key, (positions, item) in zip(keys, self._walk_many(keys)):
+            if item is None or item[0] != key:
+                raise KeyError(key)
+            locations.append(positions)
+        return locations
 
     def __contains__(self, key: K) -> bool:
         """
-        Checks to see if the given key is in the Hash Table
+        Checks to see if the given key is in the Hash Table,
+        keys with characters outside the alphabet never being in it.
 
         :complexity: See linear probe.
         """
         try:
             _ = self[key]
-        except KeyError:
+        except (KeyError, ValueError):
             return False
         else:
             return True
 
+    def _sorted_positions(self) -> list[int]:
+        """
+        Positions of the array in the order their keys sort.
+
+        The end of key position comes first, then the order given by the alphabet.
+        """
+        return [self.TABLE_SIZE - 1] + self.ALPHABET.order
+
     def sort_keys(self, current=None) -> list[str]:
         """
         Returns all keys currently in the table in lexicographically sorted order.
+
+        :complexity: O(N * TABLE_SIZE) where N is the number of tables.
+        """
+        if current is None:
+            current = []
+        stack = [self]
+        while stack:
+            item = stack.pop()
+            if not isinstance(item, InfiniteHashTable):
+                current.append(item)
+                continue
+            # Pushed in reverse so they come off the stack in sorted order.
+            for position in reversed(item._sorted_positions()):
+                sub_item = item.array[position]
+                if sub_item is None:
+                    continue
+                if item._is_table(sub_item):
+                    stack.append(sub_item[1])
+                else:
+                    stack.append(sub_item[0])
+        return current
+
+    @classmethod
+    def from_sorted(cls, items: Iterable[tuple[K, V]]) -> InfiniteHashTable[K, V]:
+        """
+        Build a table from (key, value) pairs sorted by key.
+
+        Rather than inserting one at a time (which moves keys down a level
+        every time they collide), the keys are grouped by their position at
+        each level, and every key is placed straight into the table it ends up in.
+        Repeated keys keep the last value, as with __setitem__.
+        The layout (and so get_location) is the same as inserting each pair in turn.
+
+        :complexity: O(L) where L is the total length of all keys.
+        :raises ValueError: when two keys have the same positions at every level.
+        """
+        pairs = []
+        for key, value in items:
+            if pairs and pairs[-1][0] == key:
+                pairs[-1] = (key, value)
+            else:
+                pairs.append((key, value))
+
+        root = cls()
+        # Each entry is a table still to be filled, and the pairs that belong in it.
+        pending = [(root, pairs)]
+        while pending:
+            table, table_pairs = pending.pop()
+            table.count = len(table_pairs)
+            buckets: dict[int, list[tuple[K, V]]] = {}
+            for pair in table_pairs:
+                buckets.setdefault(table.hash(pair[0]), []).append(pair)
+            for position, bucket in buckets.items():
+                if len(bucket) > 1 and position == table.TABLE_SIZE - 1:
+                    raise ValueError(f"{bucket[0][0]!r} and {bucket[1][0]!r} have the same positions at every level.")
+                if len(bucket) == 1:
+                    table.array[position] = bucket[0]
+                else:
+                    sub_table = table._new_table()
+                    table.array[position] = (bucket[0][0], sub_table)
+                    pending.append((sub_table, bucket))
+        return root
+
+    def freeze(self) -> FrozenInfiniteHashTable[K, V]:
+        """
+        Returns a read-only copy of this table packed into flat arrays.
+
+        See FrozenInfiniteHashTable.
+
+        :complexity: O(N * TABLE_SIZE + L) where N is the number of tables
+        and L is the total length of all keys.
+        """
+        node_entries = array("q", [0])
+        entry_positions = array("H")
+        entry_targets = array("q")
+        key_offsets = array("q", [0])
+        keys = []
+        values = []
+
+        # Tables are numbered in the order they are visited, so a child is
+        # numbered as soon as the entry pointing at it is written.
+        queue = [self]
+        for table in queue:
+            for position in range(table.TABLE_SIZE):
+                item = table.array[position]
+                if item is None:
+                    continue
+                entry_positions.append(position)
+                if table._is_table(item):
+                    entry_targets.append(len(queue))
+                    queue.append(item[1])
+                else:
+                    entry_targets.append(~len(values))
+                    keys.append(item[0])
+                    key_offsets.append(key_offsets[-1] + len(item[0]))
+                    values.append(item[1])
+            node_entries.append(len(entry_positions))
+
+        key_blob = b"".join(keys) if keys and isinstance(keys[0], bytes) else "".join(keys)
+        return FrozenInfiniteHashTable(
+            self.ALPHABET, node_entries, entry_positions, entry_targets, key_offsets, key_blob, values
+        )
+
+
+class FrozenInfiniteHashTable(Generic[K, V]):
+    """
+    Read-only Infinite Hash Table, made with InfiniteHashTable.freeze().
+
+    Instead of one array of TABLE_SIZE references per table, the tables are
+    numbered and stored together in flat arrays:
+        - node_entries:     Entries of table i are node_entries[i] to node_entries[i+1].
+        - entry_positions:  Position of each entry, increasing within each table.
+        - entry_targets:    The table an entry points at, or ~j for the jth key.
+        - key_offsets:      Key j is key_blob[key_offsets[j]:key_offsets[j+1]].
+    All keys are stored in one string (or bytes), and values in one list.
+
+    Keys must be strings or bytes. Values must be JSON serialisable to use `save`.
+    Unless stated otherwise, all methods have O(len(key) * log(TABLE_SIZE)) complexity.
+    """
+
+    MAGIC = "InfiniteHashTable"
+
+    def __init__(
+        self,
+        alphabet: Alphabet,
+        node_entries: array,
+        entry_positions: array,
+        entry_targets: array,
+        key_offsets: array,
+        key_blob: str | bytes,
+        values: list[V],
+    ) -> None:
+        self.ALPHABET = alphabet
+        self.TABLE_SIZE = alphabet.size + 1
+        self.node_entries = node_entries
+        self.entry_positions = entry_positions
+        self.entry_targets = entry_targets
+        self.key_offsets = key_offsets
+        self.key_blob = key_blob
+        self.values = values
+        self._rank: list[int] | None = None
+
+    def hash(self, key: K, level: int) -> int:
+        if level < self.ALPHABET.length(key):
+            return self.ALPHABET.position(key, level)
+        return self.TABLE_SIZE-1
+
+    def _key(self, leaf: int) -> K:
+        return self.key_blob[self.key_offsets[leaf]:self.key_offsets[leaf + 1]]
+
+    def _find_entry(self, node: int, position: int) -> int:
+        """Index of the entry of table `node` at `position`, or -1 if it is empty."""
+        hi = self.node_entries[node + 1]
+        entry = bisect_left(self.entry_positions, position, self.node_entries[node], hi)
+        if entry < hi and self.entry_positions[entry] == position:
+            return entry
+        return -1
+
+    def _find_leaf(self, key: K, locations: list[int] | None = None) -> int:
+        """
+        Index of the key, appending the positions walked through to `locations`.
+
+        :raises KeyError: when the key doesn't exist.
+        """
+        node = 0
+        level = 0
+        while True:
+            position = self.hash(key, level)
+            entry = self._find_entry(node, position)
+            if entry < 0:
+                raise KeyError(key)
+            if locations is not None:
+                locations.append(position)
+            target = self.entry_targets[entry]
+            if target < 0:
+                if self._key(~target) != key:
+                    raise KeyError(key)
+                return ~target
+            node = target
+            level += 1
+
+    def __getitem__(self, key: K) -> V:
+        """
+        Get the value at a certain key
+
+        :raises KeyError: when the key doesn't exist.
+        """
+        return self.values[self._find_leaf(key)]
+
+    def __contains__(self, key: K) -> bool:
+        try:
+            self._find_leaf(key)
+        except (KeyError, ValueError):
+            return False
+        else:
+            return True
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get_location(self, key: K) -> list[int]:
+        """
+        Get the sequence of positions required to access this key.
+
+        :raises KeyError: when the key doesn't exist.
+        """
+        locations = []
+        self._find_leaf(key, locations)
+        return locations
+
+    def _sorted_entries(self, node: int) -> list[int]:
+        """Entries of table `node` in the order their keys sort, as in InfiniteHashTable._sorted_positions."""
+        if self._rank is None:
+            self._rank = [0] * self.TABLE_SIZE
+            for rank, position in enumerate([self.TABLE_SIZE - 1] + self.ALPHABET.order):
+                self._rank[position] = rank
+        entries = range(self.node_entries[node], self.node_entries[node + 1])
+        return sorted(entries, key=lambda entry: self._rank[self.entry_positions[entry]])
+
+    def iter_prefix(self, prefix: K | None = None) -> Iterator[tuple[K, V]]:
+        """
+        Iterate over the (key, value) pairs whose key starts with prefix, in sorted key order.
+        With no prefix, iterates over every pair.
+
+        :complexity: O(len(prefix) * log(TABLE_SIZE) + M * TABLE_SIZE * log(TABLE_SIZE)) where
+        M is the number of tables below the prefix.
+        """
+        if prefix is None:
+            prefix = self.key_blob[:0]
+        node = 0
+        for level in range(self.ALPHABET.length(prefix)):
+            entry = self._find_entry(node, self.hash(prefix, level))
+            if entry < 0:
+                return
+            target = self.entry_targets[entry]
+            if target < 0:
+                key = self._key(~target)
+                if key.startswith(prefix):
+                    yield key, self.values[~target]
+                return
+            node = target
+
+        stack = [node]
+        while stack:
+            target = stack.pop()
+            if target < 0:
+                key = self._key(~target)
+                # Different characters can share a position, so check the prefix itself.
+                if key.startswith(prefix):
+                    yield key, self.values[~target]
+                continue
+            for entry in reversed(self._sorted_entries(target)):
+                stack.append(self.entry_targets[entry])
+
+    def sort_keys(self) -> list[K]:
+        """
+        Returns all keys in lexicographically sorted order.
+
+        :complexity: O(N * TABLE_SIZE) where N is the number of tables.
+        """
+        return [key for key, _ in self.iter_prefix()]
+
+    def save(self, path: str) -> None:
+        """
+        Write the table to a file: a JSON header line, the raw arrays,
+        the keys, then the values as JSON.
+        """
+        key_blob = self.key_blob if isinstance(self.key_blob, bytes) else self.key_blob.encode()
+        header = {
+            "magic": self.MAGIC,
+            "byteorder": sys.byteorder,
+            "alphabet": self.ALPHABET.to_dict(),
+            "bytes_keys": isinstance(self.key_blob, bytes),
+            "nodes": len(self.node_entries) - 1,
+            "entries": len(self.entry_positions),
+            "keys": len(self.values),
+            "key_blob": len(key_blob),
+        }
+        with open(path, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for arr in (self.node_entries, self.entry_positions, self.entry_targets, self.key_offsets):
+                arr.tofile(f)
+            f.write(key_blob)
+            f.write(json.dumps(self.values).encode() + b"\n")
+
+    @classmethod
+    def load(cls, path: str) -> FrozenInfiniteHashTable[K, V]:
+        """
+        Read a table written by `save`.
+
+        :raises ValueError: when the file was not written by `save`.
         """
-        raise NotImplementedError()
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if not isinstance(header, dict) or header.get("magic") != cls.MAGIC:
+                raise ValueError("Not a frozen InfiniteHashTable file.")
+            arrays = []
+            for typecode, length in (
+                ("q", header["nodes"] + 1),
+                ("H", header["entries"]),
+                ("q", header["entries"]),
+                ("q", header["keys"] + 1),
+            ):
+                arr = array(typecode)
+                arr.fromfile(f, length)
+                if header["byteorder"] != sys.byteorder:
+                    arr.byteswap()
+                arrays.append(arr)
+            key_blob = f.read(header["key_blob"])
+            if not header["bytes_keys"]:
+                key_blob = key_blob.decode()
+            values = json.loads(f.readline())
+        return cls(Alphabet.from_dict(header["alphabet"]), *arrays, key_blob, values)
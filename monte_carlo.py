@@ -0,0 +1,159 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from compiled_route import COMPUTER, SPLIT, RETURN, JUMP, CompiledRoute
+from computer import Computer
+
+from typing import TYPE_CHECKING
+
+# Avoid circular imports for typing.
+if TYPE_CHECKING:
+    from virus import ProbabilisticVirus
+
+try:
+    import numpy as np
+except ImportError:
+    # Needed for simulate_trials.
+    np = None
+
+# Trials advanced together, bounding the memory used at once.
+DEFAULT_BATCH_SIZE = 1 << 16
+
+
+@dataclass
+class MonteCarloResult:
+    """
+    The outcome of simulate_trials.
+
+        - values:       Total hacked_value of the computers added in each trial.
+        - computers:    Every distinct computer of the route, in the order they were compiled.
+        - hits:         How many times each computer was added, over all trials.
+    """
+
+    values: np.ndarray
+    computers: list[Computer]
+    hits: np.ndarray
+
+    @property
+    def trials(self) -> int:
+        return len(self.values)
+
+    def mean(self) -> float:
+        return float(self.values.mean())
+
+    def std(self) -> float:
+        return float(self.values.std())
+
+    def percentile(self, q: float | list[float]) -> float | np.ndarray:
+        """The q-th percentile(s) of the values, q between 0 and 100."""
+        return np.percentile(self.values, q)
+
+    def hit_rates(self) -> np.ndarray:
+        """
+        How often each computer was added per trial, in the order of `computers`.
+        Only above 1 if routes are shared, so a path can add the same computer twice.
+        """
+        return self.hits / self.trials
+
+
+def simulate_trials(
+    compiled: CompiledRoute,
+    virus_type: ProbabilisticVirus,
+    trials: int,
+    seed: int | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> MonteCarloResult:
+    """
+    Follows the compiled route `trials` times, each time deciding splits at random
+    with the chances of virus_type.branch_probabilities, as if calling
+    compiled.follow_path on that many fresh copies of the virus.
+
+    Trials are run in batches, all trials of a batch moving one instruction per step,
+    with the random draws for every trial at a split made at once by NumPy.
+
+    :complexity: O(T * P) array work, where T is the number of trials and P is the
+    longest path taken, and O(P) Python steps per batch.
+    :raises ValueError: when trials or batch_size is below 1.
+    :raises ImportError: when NumPy is not installed.
+    """
+    if np is None:
+        raise ImportError("NumPy is needed for Monte Carlo simulation.")
+    if trials < 1 or batch_size < 1:
+        raise ValueError("Trials and batch size should be at least 1.")
+
+    rng = np.random.default_rng(seed)
+    ops = np.frombuffer(compiled.ops, dtype=np.int8)
+    args = np.frombuffer(compiled.args, dtype=np.int64)
+    top_targets = np.frombuffer(compiled.top_targets, dtype=np.int64)
+    bottom_targets = np.frombuffer(compiled.bottom_targets, dtype=np.int64)
+
+    probabilities = [virus_type.branch_probabilities(top, bottom) for top, bottom in zip(compiled.tops, compiled.bottoms)]
+    top_chance = np.array([top for top, _ in probabilities], dtype=float)
+    branch_chance = top_chance + np.array([bottom for _, bottom in probabilities], dtype=float)
+
+    # Computers added by the route may repeat, so count hits per distinct computer.
+    computers = []
+    slots = {}
+    computer_slots = np.empty(len(compiled.computers), dtype=np.int64)
+    for i, computer in enumerate(compiled.computers):
+        if id(computer) not in slots:
+            slots[id(computer)] = len(computers)
+            computers.append(computer)
+        computer_slots[i] = slots[id(computer)]
+    computer_values = np.array([computer.hacked_value for computer in compiled.computers], dtype=float)
+
+    values = np.zeros(trials, dtype=float)
+    hits = np.zeros(len(computers), dtype=np.int64)
+    for start in range(0, trials, batch_size):
+        size = min(batch_size, trials - start)
+        batch_values = values[start:start + size]
+        pc = np.zeros(size, dtype=np.int64)
+        depth = np.zeros(size, dtype=np.int64)
+        returns = np.zeros((size, 8), dtype=np.int64)
+        active = np.arange(size)
+
+        while active.size:
+            op = ops[pc[active]]
+            finished = np.zeros(active.size, dtype=bool)
+
+            here = op == COMPUTER
+            if here.any():
+                trial = active[here]
+                computer = args[pc[trial]]
+                batch_values[trial] += computer_values[computer]
+                np.add.at(hits, computer_slots[computer], 1)
+                pc[trial] += 1
+
+            here = op == JUMP
+            if here.any():
+                trial = active[here]
+                pc[trial] = args[pc[trial]]
+
+            here = np.flatnonzero(op == SPLIT)
+            if here.size:
+                trial = active[here]
+                split = args[pc[trial]]
+                draw = rng.random(trial.size)
+                take_top = draw < top_chance[split]
+                taken = draw < branch_chance[split]
+                finished[here[~taken]] = True
+
+                trial, split, take_top = trial[taken], split[taken], take_top[taken]
+                if trial.size:
+                    if depth[trial].max() >= returns.shape[1]:
+                        returns = np.concatenate([returns, np.zeros_like(returns)], axis=1)
+                    returns[trial, depth[trial]] = pc[trial] + 1
+                    depth[trial] += 1
+                    pc[trial] = np.where(take_top, top_targets[split], bottom_targets[split])
+
+            here = np.flatnonzero(op == RETURN)
+            if here.size:
+                trial = active[here]
+                back = depth[trial] > 0
+                finished[here[~back]] = True
+                trial = trial[back]
+                depth[trial] -= 1
+                pc[trial] = returns[trial, depth[trial]]
+
+            active = active[~finished]
+
+    return MonteCarloResult(values, computers, hits)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import heapq
+from computer import Computer
+from route import RouteSummary
+
+from typing import Callable, Union
+
+
+class ComputerSink(ABC):
+    """
+    Where a virus puts the computers it adds, instead of a list.
+    Passed as `sink` to a virus, which calls append for every computer it adds,
+    so a plain list (the default) is also a sink.
+    """
+
+    @abstractmethod
+    def append(self, computer: Computer) -> None:
+        raise NotImplementedError()
+
+
+Sink = Union[list, ComputerSink]
+
+
+class AggregateSink(ComputerSink):
+    """
+    Keeps running totals of the computers added, in constant memory.
+    The extremes are None until a computer is added.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total_hacked_value = 0
+        self.min_hacking_difficulty = None
+        self.max_risk_factor = None
+
+    def append(self, computer: Computer) -> None:
+        self.count += 1
+        self.total_hacked_value += computer.hacked_value
+        if self.min_hacking_difficulty is None or computer.hacking_difficulty < self.min_hacking_difficulty:
+            self.min_hacking_difficulty = computer.hacking_difficulty
+        if self.max_risk_factor is None or computer.risk_factor > self.max_risk_factor:
+            self.max_risk_factor = computer.risk_factor
+
+    def __len__(self) -> int:
+        return self.count
+
+    def summary(self) -> RouteSummary:
+        """The totals as a RouteSummary, as Route.summary gives for a whole route."""
+        return RouteSummary(self.count, self.total_hacked_value, self.min_hacking_difficulty, self.max_risk_factor)
+
+
+class TopKSink(ComputerSink):
+    """
+    Keeps only the k computers with the largest key (hacked_value by default),
+    on ties keeping the ones added first.
+    """
+
+    def __init__(self, k: int, key: Callable[[Computer], float] | None = None) -> None:
+        """
+        :raises ValueError: when k is below 1.
+        """
+        if k < 1:
+            raise ValueError("k should be at least 1.")
+        self.k = k
+        self.key = key if key is not None else lambda computer: computer.hacked_value
+        self.added = 0
+        # Min heap of (key, -order, computer), so the root is the first to be dropped.
+        self._heap: list[tuple[float, int, Computer]] = []
+
+    def append(self, computer: Computer) -> None:
+        """
+        :complexity: O(log k)
+        """
+        entry = (self.key(computer), -self.added, computer)
+        self.added += 1
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def items(self) -> list[Computer]:
+        """
+        The computers kept, largest key first.
+
+        :complexity: O(k log k)
+        """
+        return [computer for _, _, computer in sorted(self._heap, key=lambda entry: entry[:2], reverse=True)]
+
+
+class CallbackSink(ComputerSink):
+    """Passes each computer to a callback as it is added, keeping nothing."""
+
+    def __init__(self, callback: Callable[[Computer], None]) -> None:
+        self.callback = callback
+        self.count = 0
+
+    def append(self, computer: Computer) -> None:
+        self.count += 1
+        self.callback(computer)
+
+    def __len__(self) -> int:
+        return self.count
@@ -1,14 +1,20 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field
 from collections import deque
+import hashlib
+import json
+import struct
 from branch_decision import BranchDecision
 from computer import Computer
 
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, TextIO, Union
 
 # Avoid circular imports for typing.
 if TYPE_CHECKING:
-    from virus import VirusType
+    from compiled_route import CompiledRoute
+    from route_tracing import Tracer
+    from virus import AsyncVirusType, VirusType
 
 
 @dataclass
@@ -84,11 +90,84 @@ class RouteSeries:
 
 RouteStore = Union[RouteSplit, RouteSeries, None]
 
+# Tokens used by Route.to_tokens, any token >= 0 is a computer index.
+EMPTY_TOKEN = -1
+SPLIT_TOKEN = -2
+# Tokens from here down refer back to a route already written, see Route.to_tokens.
+FIRST_REF_TOKEN = -3
+
+# Bytes in a Route.digest().
+DIGEST_SIZE = 16
+EMPTY_DIGEST = hashlib.blake2b(b"empty", digest_size=DIGEST_SIZE).digest()
+# How a computer is written into a digest: name length, then its numbers, then its name.
+DIGEST_COMPUTER = struct.Struct("<qddd")
+
+# Returned by next() when a spec or token stream has run out.
+_NO_ITEM = object()
+
+# Most tokens written to each line by Route.dump.
+DUMP_CHUNK_SIZE = 4096
+
+
+def _dump_chunk(computers: list[Computer], tokens: list[int]) -> str:
+    """A line of Route.dump: the computers first used in it, then its tokens."""
+    fields = [[c.name, c.hacking_difficulty, c.hacked_value, c.risk_factor] for c in computers]
+    return json.dumps([fields, tokens], separators=(",", ":")) + "\n"
+
+
+@dataclass(frozen=True)
+class RouteSummary:
+    """
+    Totals and extremes over all computers in a route (every branch included).
+    The extremes are None for a route with no computers.
+    """
+
+    count: int = 0
+    total_hacked_value: int = 0
+    min_hacking_difficulty: int | None = None
+    max_risk_factor: float | None = None
+
+    @staticmethod
+    def of_computer(computer: Computer) -> RouteSummary:
+        return RouteSummary(1, computer.hacked_value, computer.hacking_difficulty, computer.risk_factor)
+
+    @staticmethod
+    def combine(summaries: list[RouteSummary]) -> RouteSummary:
+        """The summary of all the routes summarised."""
+        difficulties = [s.min_hacking_difficulty for s in summaries if s.min_hacking_difficulty is not None]
+        risks = [s.max_risk_factor for s in summaries if s.max_risk_factor is not None]
+        return RouteSummary(
+            sum(s.count for s in summaries),
+            sum(s.total_hacked_value for s in summaries),
+            min(difficulties) if difficulties else None,
+            max(risks) if risks else None,
+        )
+
+
+EMPTY_SUMMARY = RouteSummary()
+
 
 @dataclass
 class Route:
+    """
+    Routes are equal when they have the same structure and computers,
+    compared (and hashed) by digest, see Route.digest.
+    """
 
     store: RouteStore = None
+    _summary: RouteSummary | None = field(default=None, init=False, repr=False, compare=False)
+    _digest: bytes | None = field(default=None, init=False, repr=False, compare=False)
+
+    def __eq__(self, other: object) -> bool:
+        """
+        :complexity: O(1) once both digests are computed, see digest.
+        """
+        if not isinstance(other, Route):
+            return NotImplemented
+        return self is other or self.digest() == other.digest()
+
+    def __hash__(self) -> int:
+        return hash(self.digest())
 
     def add_computer_before(self, computer: Computer) -> Route:
         """
@@ -109,9 +188,52 @@ class Route:
         )
         return Route(empty_branch)
 
-    def follow_path(self, virus_type: VirusType) -> None:
-        """Follow a path and add computers according to a virus_type."""
+    def edit_at(self, path: Iterable[str], op: Callable[[Route], Route]) -> Route:
+        """
+        Returns a *new* route which would be the result of:
+        Replacing the route found by following path with op(that route).
+
+        Each step of the path is "following" (of a series or split), "top" or "bottom" (of a split).
+        Only the routes along the path are copied, everything else is shared with this route.
+        For example, to add a computer after the first computer of the top branch:
+            route.edit_at(["top"], lambda r: Route(r.store.add_computer_after(computer)))
+
+        :complexity: O(D) where D is the length of the path, plus the cost of op.
+        :raises ValueError: when a step doesn't exist on the route it is taken from.
+        """
+        path = list(path)
+        routes = [self]
+        for step in path:
+            store = routes[-1].store
+            if isinstance(store, RouteSplit) and step in ("top", "bottom", "following"):
+                routes.append(getattr(store, step))
+            elif isinstance(store, RouteSeries) and step == "following":
+                routes.append(store.following)
+            else:
+                raise ValueError(f"Can't take step {step!r} from {type(store).__name__}.")
+
+        new_route = op(routes[-1])
+        for i in range(len(path) - 1, -1, -1):
+            store = routes[i].store
+            if isinstance(store, RouteSeries):
+                new_route = Route(RouteSeries(store.computer, new_route))
+            else:
+                new_route = Route(RouteSplit(
+                    new_route if path[i] == "top" else store.top,
+                    new_route if path[i] == "bottom" else store.bottom,
+                    new_route if path[i] == "following" else store.following,
+                ))
+        return new_route
+
+    def follow_path(self, virus_type: VirusType, tracer: Tracer | None = None) -> None:
+        """
+        Follow a path and add computers according to a virus_type.
 
+        :param tracer: called at every step of the path, see route_tracing.Tracer.
+        """
+        if tracer is not None:
+            from route_tracing import trace_path
+            return trace_path(self, virus_type, tracer)
 
         rest_store_list = deque() 
         rest_store_list.append(self.store)
@@ -144,24 +266,470 @@ class Route:
                 rest_store_list.append(next_store)
 
 
-    def add_all_computers(self) -> list[Computer]:
-        """Returns a list of all computers on the route."""
+    async def afollow_path(self, virus_type: AsyncVirusType) -> None:
+        """
+        Follow a path and add computers according to an async virus_type,
+        awaiting each of its branch decisions. See async_traversal.afollow_path.
+        """
+        from async_traversal import afollow_path
+        await afollow_path(self, virus_type)
+
+    def follow_paths(self, viruses: list[VirusType]) -> None:
+        """
+        Follow a path for each of the viruses, as if calling follow_path on each.
+
+        Viruses that make the same decisions walk the route together, and are
+        only split into separate groups where their decisions differ.
+        Each group keeps the routes still to follow as a linked list of
+        (store, rest) pairs, so splitting a group doesn't copy it.
+
+        :complexity: O(G + C) where G is the number of nodes walked by each group
+        and C is the number of computers added and branches selected over all viruses.
+        """
+        pending = [(self.store, list(viruses), None)]
+
+        while len(pending):
+            next_store, group, rest = pending.pop()
+
+            while True:
+                if isinstance(next_store, RouteSplit):
+                    top_group = []
+                    bottom_group = []
+                    for virus_type in group:
+                        decision = virus_type.select_branch(next_store.top, next_store.bottom)
+                        if (decision == BranchDecision.TOP):
+                            top_group.append(virus_type)
+                        elif (decision == BranchDecision.BOTTOM):
+                            bottom_group.append(virus_type)
+
+                    rest = (next_store.following.store, rest)
+                    if len(top_group) and len(bottom_group):
+                        pending.append((next_store.bottom.store, bottom_group, rest))
+                    if len(top_group):
+                        group = top_group
+                        next_store = next_store.top.store
+                    elif len(bottom_group):
+                        group = bottom_group
+                        next_store = next_store.bottom.store
+                    else:
+                        break
+
+                elif isinstance(next_store, RouteSeries):
+                    for virus_type in group:
+                        virus_type.add_computer(next_store.computer)
+                    next_store = next_store.following.store
+
+                elif rest is not None:
+                    next_store, rest = rest
+
+                else:
+                    break
+
+    def iter_tokens(self, computers: list[Computer]) -> Iterator[int]:
+        """
+        Yields the tokens of to_tokens one at a time, appending each
+        computer to computers the first time it is referred to.
 
-        computers_list = []
-        searching_list = [self.store]  
+        :complexity: O(1) per token.
+        """
+        computer_index = {id(computer): i for i, computer in enumerate(computers)}
+        # Number of each store already written (by id), kept alive so ids aren't reused.
+        written: dict[int, tuple[int, RouteStore]] = {}
+        count = 0
+        stack = [self]
+
+        while len(stack):
+            store = stack.pop().store
+
+            if store is not None:
+                if id(store) in written:
+                    yield FIRST_REF_TOKEN - written[id(store)][0]
+                    continue
+                written[id(store)] = (count, store)
+            count += 1
+
+            if isinstance(store, RouteSplit):
+                yield SPLIT_TOKEN
+                stack.append(store.following)
+                stack.append(store.bottom)
+                stack.append(store.top)
+
+            elif isinstance(store, RouteSeries):
+                index = computer_index.get(id(store.computer))
+                if index is None:
+                    index = computer_index[id(store.computer)] = len(computers)
+                    computers.append(store.computer)
+                yield index
+                stack.append(store.following)
+
+            else:
+                yield EMPTY_TOKEN
 
-        while len(searching_list) > 0:
-            current = searching_list.pop(0)
+    def to_tokens(self) -> tuple[array, list[Computer]]:
+        """
+        Returns the route as a flat list of tokens in pre-order, and the computers they refer to.
+
+        A token >= 0 is a series with that computer, followed by the tokens of its following route.
+        SPLIT_TOKEN is followed by the tokens of the top, bottom and following routes.
+        EMPTY_TOKEN is an empty route.
+        Each computer is only stored once, however many times it appears.
+        Routes are numbered from 0 in the order their (non reference) tokens are written,
+        and a part shared by several routes is only written the first time, after that
+        it is the token FIRST_REF_TOKEN - number, so shared parts don't repeat.
+
+        :complexity: O(N) where N is the number of distinct nodes in the route.
+        """
+        computers = []
+        tokens = array("q", self.iter_tokens(computers))
+        return tokens, computers
+
+    @staticmethod
+    def from_tokens(tokens: array | list[int], computers: list[Computer]) -> Route:
+        """
+        Returns the route made by to_tokens.
+
+        Reading the tokens backwards, every route's parts are already built when it is reached.
+        References to shared routes point backwards, so those are read forwards instead.
+
+        :complexity: O(N) where N is the number of tokens.
+        """
+        if len(tokens) and min(tokens) <= FIRST_REF_TOKEN:
+            return Route.from_token_stream(iter(tokens), computers)
+        built = []
+
+        for i in range(len(tokens) - 1, -1, -1):
+            token = tokens[i]
+            if token == SPLIT_TOKEN:
+                top = built.pop()
+                bottom = built.pop()
+                following = built.pop()
+                built.append(Route(RouteSplit(top, bottom, following)))
+            elif token == EMPTY_TOKEN:
+                built.append(Route(None))
+            else:
+                built.append(Route(RouteSeries(computers[token], built.pop())))
+
+        return built.pop()
+
+    @staticmethod
+    def from_token_stream(tokens: Iterator[int], computers: list[Computer]) -> Route:
+        """
+        Returns the route made by to_tokens, reading tokens in order and only as many as needed.
+        Computers only need to be in the list by the time a token refers to them.
+
+        :complexity: O(N) where N is the number of tokens read.
+        :raises ValueError: when the tokens run out before the route is finished.
+        """
+        return Route._fill_holes((computers[token] if token >= 0 else token for token in tokens), True)
+
+    @staticmethod
+    def build(spec: Iterable[Computer | int | None]) -> Route:
+        """
+        Returns the route described by a flat spec, in the order of to_tokens:
+        a Computer for a series, SPLIT_TOKEN for a split (then its top, bottom
+        and following routes), and EMPTY_TOKEN or None for an empty route.
+        Routes still unfinished when the spec ends are empty, so
+        Route.build([a, SPLIT_TOKEN, b, None, None, c]) is a, then a split between b
+        and nothing, then c.
+
+        Every Route is made once, already holding its store.
+
+        :complexity: O(N) where N is the length of the spec.
+        :raises ValueError: on an item which is not a computer or token,
+        or when the spec goes on after the route is finished.
+        """
+        spec = iter(spec)
+        route = Route._fill_holes(spec, False)
+        if next(spec, _NO_ITEM) is not _NO_ITEM:
+            raise ValueError("The spec goes on after the route is finished.")
+        return route
+
+    @staticmethod
+    def _fill_holes(items: Iterator[Computer | int | None], strict: bool) -> Route:
+        """
+        Builds the route described by items (see build), reading only as many as needed.
+        Each store is made as soon as its item is read, leaving holes for its parts.
+
+        :param strict: raise ValueError if items end early, instead of leaving the rest empty.
+        """
+        root = Route(None)
+        holes = [(root, "store")]
+        # Every route made so far, by number, for references to shared routes.
+        routes = []
+
+        while len(holes):
+            item = next(items, _NO_ITEM)
+            if item is _NO_ITEM:
+                if strict:
+                    raise ValueError("Tokens ended before the route was finished.")
+                item = EMPTY_TOKEN
+            holder, attribute = holes.pop()
+
+            if isinstance(item, Computer):
+                store = RouteSeries(item, None)
+                holes.append((store, "following"))
+            elif item == SPLIT_TOKEN:
+                store = RouteSplit(None, None, None)
+                holes.append((store, "following"))
+                holes.append((store, "bottom"))
+                holes.append((store, "top"))
+            elif item is None or item == EMPTY_TOKEN:
+                store = None
+            elif isinstance(item, int) and FIRST_REF_TOKEN - len(routes) < item <= FIRST_REF_TOKEN and holder is not root:
+                setattr(holder, attribute, routes[FIRST_REF_TOKEN - item])
+                continue
+            else:
+                raise ValueError(f"{item!r} is not a computer or route token.")
+
+            if holder is root:
+                root.store = store
+                routes.append(root)
+            else:
+                route = Route(store)
+                setattr(holder, attribute, route)
+                routes.append(route)
+
+        return root
+
+    def dump(self, fp: TextIO) -> None:
+        """
+        Writes the route to a text file as JSON lines, see load.
+
+        The first line is a header. Every other line holds the computers
+        first referred to in it, then up to DUMP_CHUNK_SIZE tokens (see to_tokens).
+        Lines are written as they fill up, so the route is never held as tokens all at once.
+
+        :complexity: O(N) where N is the number of distinct nodes in the route.
+        """
+        # Version 2 added references to shared routes.
+        fp.write(json.dumps({"format": "route", "version": 2}) + "\n")
+        computers = []
+        written = 0
+        chunk = []
+
+        for token in self.iter_tokens(computers):
+            chunk.append(token)
+            if len(chunk) == DUMP_CHUNK_SIZE:
+                fp.write(_dump_chunk(computers[written:], chunk))
+                written = len(computers)
+                chunk = []
+
+        if len(chunk):
+            fp.write(_dump_chunk(computers[written:], chunk))
+
+    @staticmethod
+    def load(fp: TextIO) -> Route:
+        """
+        Reads a route written by dump.
+
+        :complexity: O(N) where N is the number of nodes in the route.
+        :raises ValueError: when the file was not written by dump, or is incomplete.
+        """
+        header = json.loads(fp.readline() or "null")
+        if not isinstance(header, dict) or header.get("format") != "route" or header.get("version") not in (1, 2):
+            raise ValueError("Not a route file.")
+        computers = []
+
+        def tokens() -> Iterator[int]:
+            for line in fp:
+                new_computers, chunk = json.loads(line)
+                computers.extend(Computer(*fields) for fields in new_computers)
+                yield from chunk
+
+        return Route.from_token_stream(tokens(), computers)
+
+    def compile(self) -> CompiledRoute:
+        """
+        Returns the route flattened into instructions, for following many times.
+        See CompiledRoute.
+        """
+        from compiled_route import CompiledRoute
+        return CompiledRoute(self)
+
+    def summary(self) -> RouteSummary:
+        """
+        Returns the totals and extremes of all computers on the route.
+
+        Computed the first time it is asked for, and cached on this route
+        and every route inside it, so routes must not be changed afterwards.
+        Shared parts are only summarised once, but count towards every route they are in.
+
+        :complexity: O(1) once computed, O(N) the first time
+        where N is the number of nodes not already summarised.
+        """
+        stack = [(self, False)]
+
+        while len(stack) and self._summary is None:
+            current, children_done = stack.pop()
+            if current._summary is not None:
+                continue
+            store = current.store
+
+            if store is None:
+                current._summary = EMPTY_SUMMARY
+                continue
+
+            if isinstance(store, RouteSplit):
+                children = [store.top, store.bottom, store.following]
+            else:
+                children = [store.following]
+
+            if not children_done:
+                stack.append((current, True))
+                for child in children:
+                    if child._summary is None:
+                        stack.append((child, False))
+                continue
+
+            summaries = [child._summary for child in children]
+            if isinstance(store, RouteSeries):
+                summaries.append(RouteSummary.of_computer(store.computer))
+            current._summary = RouteSummary.combine(summaries)
+
+        return self._summary
+
+    def digest(self) -> bytes:
+        """
+        Returns a hash of the route's structure and computers, covering every
+        route inside it, so equal routes have the same digest and different
+        routes (in practice) never do. Checking whether a sub-route has changed
+        is comparing its digest with an old one.
+
+        Computed the first time it is asked for, and cached on this route
+        and every route inside it, so routes must not be changed afterwards.
+
+        :complexity: O(1) once computed, O(N) the first time
+        where N is the number of nodes not already digested.
+        """
+        stack = [(self, False)]
+
+        while len(stack) and self._digest is None:
+            current, children_done = stack.pop()
+            if current._digest is not None:
+                continue
+            store = current.store
+
+            if store is None:
+                current._digest = EMPTY_DIGEST
+                continue
+
+            if isinstance(store, RouteSplit):
+                children = [store.top, store.bottom, store.following]
+            else:
+                children = [store.following]
+
+            if not children_done:
+                stack.append((current, True))
+                for child in children:
+                    if child._digest is None:
+                        stack.append((child, False))
+                continue
+
+            if isinstance(store, RouteSeries):
+                computer = store.computer
+                name = computer.name.encode()
+                # Numbers as floats, so equal computers digest the same whether they hold 1 or 1.0.
+                node = b"series" + DIGEST_COMPUTER.pack(
+                    len(name),
+                    float(computer.hacking_difficulty),
+                    float(computer.hacked_value),
+                    float(computer.risk_factor),
+                ) + name
+            else:
+                node = b"split"
+            hasher = hashlib.blake2b(node, digest_size=DIGEST_SIZE)
+            for child in children:
+                hasher.update(child._digest)
+            current._digest = hasher.digest()
+
+        return self._digest
+
+    def iter_computers(self, order: str = "bfs", distinct: bool = False) -> Iterator[Computer]:
+        """
+        Yields every computer on the route, one at a time.
+
+        order = "bfs": Breadth first, the same order as add_all_computers.
+        order = "dfs": Depth first, each split's top, then bottom, then following route.
+
+        A part shared by several routes is visited once for each route it is in,
+        as add_all_computers does. With distinct, each distinct route object is
+        only visited once, in the order of iter_distinct_routes, which is depth first
+        whatever the order asked for.
+
+        :complexity: O(1) per computer (and per split), with distinct O(1) per distinct
+        route and O(D) memory for D distinct routes.
+        :raises ValueError: when order is not "bfs" or "dfs".
+        """
+        if order not in ("bfs", "dfs"):
+            raise ValueError(f"Unknown order {order!r}, should be 'bfs' or 'dfs'.")
+        if distinct:
+            for route in self.iter_distinct_routes():
+                store = route.store
+                if isinstance(store, RouteSeries):
+                    yield store.computer
+            return
+
+        if order == "bfs":
+            searching = deque()
+            take = searching.popleft
+        else:
+            searching = []
+            take = searching.pop
+
+        if self.store is not None:
+            searching.append(self.store)
+
+        while len(searching) > 0:
+            current = take()
 
             if isinstance(current, RouteSeries):
-                computers_list.append(current.computer)
-                if current.following.store!= None:
-                    searching_list.append(current.following.store)
+                yield current.computer
+                pointers = [current.following.store]
 
             elif isinstance(current, RouteSplit):
-                for pointer in [current.top.store, current.bottom.store, current.following.store]:
-                    if pointer != None:
-                        searching_list.append(pointer)
+                pointers = [current.top.store, current.bottom.store, current.following.store]
+                if order == "dfs":
+                    pointers.reverse()
 
+            for pointer in pointers:
+                if pointer is not None:
+                    searching.append(pointer)
 
-        return computers_list
\ No newline at end of file
+    def iter_distinct_routes(self) -> Iterator[Route]:
+        """
+        Yields this route and every distinct route object inside it, depth first,
+        so a route shared by several others is only yielded once.
+
+        :complexity: O(1) per distinct route, and O(D) memory for D distinct routes.
+        """
+        seen = {id(self)}
+        stack = [self]
+
+        while len(stack):
+            current = stack.pop()
+            yield current
+            store = current.store
+            if isinstance(store, RouteSplit):
+                children = [store.following, store.bottom, store.top]
+            elif isinstance(store, RouteSeries):
+                children = [store.following]
+            else:
+                children = []
+            for child in children:
+                if id(child) not in seen:
+                    seen.add(id(child))
+                    stack.append(child)
+
+    def count_computers(self) -> int:
+        """
+        Returns the number of computers on the route, without building a list.
+        As with add_all_computers, a part shared by several routes counts for each of them.
+        Uses (and caches) summary().
+
+        :complexity: O(1) once summarised, otherwise see summary.
+        """
+        return self.summary().count
+
+    def add_all_computers(self) -> list[Computer]:
+        """Returns a list of all computers on the route."""
+        return list(self.iter_computers())
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit
+
+
+class RouteInterner:
+    """
+    Hash-consing factory for routes.
+
+    Returns one canonical Route for each distinct structure, so identical
+    sub-routes (including every empty route) are shared instead of copied.
+    Computers with equal fields are shared as well.
+
+    Nodes are looked up by the identity of their (already canonical) parts,
+    so interned routes must not be changed afterwards.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self) -> None:
+        self.empty = Route(None)
+        self._computers: dict[tuple, Computer] = {}
+        self._routes: dict[tuple, Route] = {}
+
+    def __len__(self) -> int:
+        """Number of distinct non-empty routes made so far."""
+        return len(self._routes)
+
+    def computer(self, computer: Computer) -> Computer:
+        """Returns the canonical computer equal to this one."""
+        key = (computer.name, computer.hacking_difficulty, computer.hacked_value, computer.risk_factor)
+        return self._computers.setdefault(key, computer)
+
+    def series(self, computer: Computer, following: Route) -> Route:
+        """
+        Returns the canonical route for computer followed by following.
+
+        :pre: following is canonical.
+        """
+        computer = self.computer(computer)
+        key = (id(computer), id(following))
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = Route(RouteSeries(computer, following))
+        return route
+
+    def split(self, top: Route, bottom: Route, following: Route) -> Route:
+        """
+        Returns the canonical route for a split between top and bottom, then following.
+
+        :pre: top, bottom and following are canonical.
+        """
+        key = (id(top), id(bottom), id(following))
+        route = self._routes.get(key)
+        if route is None:
+            route = self._routes[key] = Route(RouteSplit(top, bottom, following))
+        return route
+
+    def add_computer_before(self, route: Route, computer: Computer) -> Route:
+        """Canonical version of Route.add_computer_before, for a canonical route."""
+        return self.series(computer, route)
+
+    def add_empty_branch_before(self, route: Route) -> Route:
+        """Canonical version of Route.add_empty_branch_before, for a canonical route."""
+        return self.split(self.empty, self.empty, route)
+
+    def intern(self, route: Route) -> Route:
+        """
+        Returns the canonical route with the same structure as route.
+
+        Parts of route that are already shared are only visited once.
+
+        :complexity: O(N) where N is the number of distinct nodes in the route.
+        """
+        canonical: dict[int, Route] = {}
+        stack = [(route, False)]
+
+        while len(stack):
+            current, children_done = stack.pop()
+            if id(current) in canonical:
+                continue
+            store = current.store
+
+            if store is None:
+                canonical[id(current)] = self.empty
+
+            elif not children_done:
+                stack.append((current, True))
+                if isinstance(store, RouteSplit):
+                    children = [store.following, store.bottom, store.top]
+                else:
+                    children = [store.following]
+                for child in children:
+                    if id(child) not in canonical:
+                        stack.append((child, False))
+
+            elif isinstance(store, RouteSplit):
+                canonical[id(current)] = self.split(
+                    canonical[id(store.top)], canonical[id(store.bottom)], canonical[id(store.following)]
+                )
+
+            else:
+                canonical[id(current)] = self.series(store.computer, canonical[id(store.following)])
+
+        return canonical[id(route)]
@@ -0,0 +1,230 @@
+from __future__ import annotations
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing.context import BaseContext
+import os
+from branch_decision import BranchDecision
+from computer import Computer
+from result_sinks import Sink
+from route import Route, RouteSeries
+from virus import VirusType
+
+from typing import Callable
+
+# A route as sent to a worker: the bytes of its tokens, and its computers as tuples.
+PackedRoute = tuple[bytes, list[tuple[str, int, int, float]]]
+
+
+def pack_route(route: Route) -> tuple[PackedRoute, list[Computer]]:
+    """
+    Returns a compact form of the route for sending to another process,
+    and the computers its results refer to.
+
+    :complexity: O(N) where N is the number of nodes in the route.
+    """
+    tokens, computers = route.to_tokens()
+    fields = [(c.name, c.hacking_difficulty, c.hacked_value, c.risk_factor) for c in computers]
+    return (tokens.tobytes(), fields), computers
+
+
+def unpack_route(packed: PackedRoute) -> tuple[Route, list[Computer]]:
+    """
+    Rebuilds a route made by pack_route, and the computers in it.
+
+    :complexity: O(N) where N is the number of nodes in the route.
+    """
+    token_bytes, fields = packed
+    tokens = array("q")
+    tokens.frombytes(token_bytes)
+    computers = [Computer(*computer) for computer in fields]
+    return Route.from_tokens(tokens, computers), computers
+
+
+# Routes being simulated, which forked workers inherit instead of being sent them.
+_shared_routes: list[Route] = []
+
+# What each decision is recorded as by _Recorder, and read back by _replay.
+TOP = BranchDecision.TOP.value
+BOTTOM = BranchDecision.BOTTOM.value
+STOP = BranchDecision.STOP.value
+
+
+class _Recorder(VirusType):
+    """
+    Passes everything on to another virus, keeping what the parent process needs
+    to rebuild its path without following the route again.
+
+    With `slots` (the index of each computer in its route's table, by id), keeps the
+    index of every computer added. Otherwise keeps the decision made at every split.
+    """
+
+    def __init__(self, virus_type: VirusType, slots: dict[int, int] | None = None) -> None:
+        super().__init__(virus_type.computers)
+        self.virus_type = virus_type
+        self.slots = slots
+        self.decisions = bytearray()
+        self.indices = array("q")
+
+    def add_computer(self, computer: Computer) -> None:
+        self.virus_type.add_computer(computer)
+        if self.slots is not None:
+            self.indices.append(self.slots[id(computer)])
+
+    def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+        decision = self.virus_type.select_branch(top_branch, bottom_branch)
+        if self.slots is None:
+            self.decisions.append(decision.value)
+        return decision
+
+
+def _replay(route: Route, decisions: bytes) -> list[Computer]:
+    """
+    The computers on the path through route which makes these decisions, see _Recorder.
+    Much cheaper than following it with a virus again, so forked workers can send
+    only the decisions back: the parent has no table to look computers up in
+    which would be cheaper to build than this walk along the path.
+
+    :complexity: O(P) where P is the length of the path.
+    """
+    computers = []
+    rest_store_list = [route.store]
+    next_decision = 0
+
+    while len(rest_store_list):
+        store = rest_store_list.pop()
+        while store is not None:
+            if isinstance(store, RouteSeries):
+                computers.append(store.computer)
+                store = store.following.store
+                continue
+
+            decision = decisions[next_decision]
+            next_decision += 1
+            if decision == STOP:
+                return computers
+            rest_store_list.append(store.following.store)
+            store = store.top.store if decision == TOP else store.bottom.store
+
+    return computers
+
+
+def _simulate_chunk(
+    job: tuple[int, int, list[PackedRoute] | None, list[type[VirusType]], Callable[[], Sink] | None]
+) -> list[list[bytes | array | Sink]]:
+    """
+    Follows routes[start:stop] with each virus type, run in a worker process.
+    The routes are the inherited _shared_routes, unless they were packed into the job.
+
+    Returns for each virus on each route, whatever is cheapest for the parent to turn into its result:
+    the filled sink when given a sink type, otherwise the index of each computer added
+    in the route's table (see pack_route) for packed routes, or else the decision made at each split.
+    """
+    start, stop, packed_routes, virus_types, sink_type = job
+    if packed_routes is None:
+        routes = _shared_routes[start:stop]
+        tables = [None] * len(routes)
+    else:
+        routes, tables = zip(*(unpack_route(packed) for packed in packed_routes))
+
+    chunk = []
+    for route, table in zip(routes, tables):
+        slots = None if table is None else {id(computer): i for i, computer in enumerate(table)}
+        row = []
+        for virus_type in virus_types:
+            if sink_type is not None:
+                virus = virus_type(sink=sink_type())
+                route.follow_path(virus)
+                row.append(virus.computers)
+                continue
+            recorder = _Recorder(virus_type(), slots)
+            route.follow_path(recorder)
+            row.append(bytes(recorder.decisions) if slots is None else recorder.indices)
+        chunk.append(row)
+    return chunk
+
+
+def simulate(
+    routes: list[Route],
+    virus_types: list[type[VirusType]],
+    processes: int | None = None,
+    chunk_size: int | None = None,
+    mp_context: BaseContext | None = None,
+    sink_type: Callable[[], Sink] | None = None,
+) -> list[list[list[Computer] | Sink]]:
+    """
+    Follows every route with a new virus of every type, spread over a pool of processes.
+
+    Workers are given chunks of routes, and send back as little as lets this process
+    rebuild each path without following it. When workers are forked (the default on Linux)
+    they already have the routes, so nothing about a route is sent or packed, and they send
+    back the decisions each virus made, which are replayed here on the original routes.
+    Otherwise each chunk carries its routes as tokens (see pack_route), and workers send
+    back the index of each computer added in the table of computers made while packing.
+    Virus types must be importable by the workers, and are created with no arguments
+    (other than the sink).
+
+    :param processes: number of worker processes, defaults to the number of CPUs.
+        With 1, the routes are simply followed one after another in this process.
+    :param chunk_size: number of routes sent to a worker at a time.
+    :param mp_context: multiprocessing context for the workers, see ProcessPoolExecutor.
+    :param sink_type: makes the sink of each virus, e.g. AggregateSink (see result_sinks).
+        Workers then send back the filled sinks, which must be picklable, instead of
+        anything about the paths, so this process does almost nothing per result.
+    :returns: results[i][j] is the list of computers virus_types[j] adds on routes[i]
+        (or its sink, with sink_type), in the same order as the routes and virus types given.
+    :complexity: O(P) over all routes in this process, where P is the total length of the
+        paths taken, plus O(N) packing when not forking, where N is the number of nodes.
+        With sink_type, O(R * V) for R routes and V virus types (plus packing).
+    """
+    global _shared_routes
+
+    if processes == 1:
+        results = []
+        for route in routes:
+            row = []
+            for virus_type in virus_types:
+                virus = virus_type() if sink_type is None else virus_type(sink=sink_type())
+                route.follow_path(virus)
+                row.append(virus.computers)
+            results.append(row)
+        return results
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if chunk_size is None:
+        # A few chunks per worker, so a slow chunk doesn't hold up the rest.
+        chunk_size = max(1, len(routes) // (4 * processes))
+    if mp_context is None:
+        mp_context = multiprocessing.get_context()
+    forking = mp_context.get_start_method() == "fork"
+
+    jobs = []
+    tables: list[list[Computer]] = []
+    for start in range(0, len(routes), chunk_size):
+        stop = min(start + chunk_size, len(routes))
+        packed_routes = None
+        if not forking:
+            packed_routes = []
+            for route in routes[start:stop]:
+                packed, table = pack_route(route)
+                packed_routes.append(packed)
+                tables.append(table)
+        jobs.append((start, stop, packed_routes, virus_types, sink_type))
+
+    _shared_routes = routes
+    try:
+        with ProcessPoolExecutor(processes, mp_context=mp_context) as executor:
+            results = []
+            for (start, stop, _, _, _), chunk in zip(jobs, executor.map(_simulate_chunk, jobs)):
+                if sink_type is not None:
+                    results.extend(chunk)
+                elif forking:
+                    for route, route_decisions in zip(routes[start:stop], chunk):
+                        results.append([_replay(route, decisions) for decisions in route_decisions])
+                else:
+                    for table, route_indices in zip(tables[start:stop], chunk):
+                        results.append([list(map(table.__getitem__, indices)) for indices in route_indices])
+            return results
+    finally:
+        _shared_routes = []
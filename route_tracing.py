@@ -0,0 +1,137 @@
+from __future__ import annotations
+from collections import Counter
+from time import perf_counter
+from branch_decision import BranchDecision
+from route import Route, RouteSeries, RouteSplit
+
+from typing import TYPE_CHECKING
+
+# Avoid circular imports for typing.
+if TYPE_CHECKING:
+    from virus import VirusType
+
+
+class Tracer:
+    """
+    Receives a callback for each step of Route.follow_path(virus_type, tracer).
+
+    Every callback does nothing by default, so subclasses only override the ones they need.
+    """
+
+    def on_series(self, virus_type: VirusType, series: RouteSeries) -> None:
+        """Called before the computer of series is added to the virus."""
+
+    def on_branch(self, virus_type: VirusType, split: RouteSplit, decision: BranchDecision, seconds: float) -> None:
+        """Called after select_branch, with its decision and how long it took."""
+
+    def on_stop(self, virus_type: VirusType, split: RouteSplit) -> None:
+        """Called when the virus decides to stop at split, before the path ends."""
+
+    def on_finish(self, virus_type: VirusType, seconds: float) -> None:
+        """Called when the path ends, with how long following it took."""
+
+
+class TraceCollector(Tracer):
+    """
+    Totals of everything traced, over every path followed with it.
+    Strategies are the class names of the viruses.
+
+        - series_count, split_count, stop_count:  Nodes visited and stops.
+        - paths:            Paths followed by each strategy.
+        - path_seconds:     Time spent following paths, by strategy.
+        - branch_seconds:   Time spent in select_branch, by strategy.
+        - decisions:        How often each (strategy, decision) was made.
+
+    Unless stated otherwise, all methods have O(1) complexity.
+    """
+
+    def __init__(self) -> None:
+        self.series_count = 0
+        self.split_count = 0
+        self.stop_count = 0
+        self.paths: Counter[str] = Counter()
+        self.path_seconds: Counter[str] = Counter()
+        self.branch_seconds: Counter[str] = Counter()
+        self.decisions: Counter[tuple[str, BranchDecision]] = Counter()
+
+    def on_series(self, virus_type: VirusType, series: RouteSeries) -> None:
+        self.series_count += 1
+
+    def on_branch(self, virus_type: VirusType, split: RouteSplit, decision: BranchDecision, seconds: float) -> None:
+        strategy = type(virus_type).__name__
+        self.split_count += 1
+        self.branch_seconds[strategy] += seconds
+        self.decisions[(strategy, decision)] += 1
+
+    def on_stop(self, virus_type: VirusType, split: RouteSplit) -> None:
+        self.stop_count += 1
+
+    def on_finish(self, virus_type: VirusType, seconds: float) -> None:
+        strategy = type(virus_type).__name__
+        self.paths[strategy] += 1
+        self.path_seconds[strategy] += seconds
+
+    def histogram(self, strategy: str) -> dict[BranchDecision, int]:
+        """How often the strategy made each decision."""
+        return {decision: self.decisions[(strategy, decision)] for decision in BranchDecision}
+
+    def report(self) -> str:
+        """
+        A readable table of the totals, one line per strategy.
+
+        :complexity: O(S) where S is the number of strategies traced.
+        """
+        lines = [
+            f"series: {self.series_count}, splits: {self.split_count}, stops: {self.stop_count}",
+            f"{'strategy':<20} {'paths':>8} {'path ms':>10} {'branch ms':>10} {'top':>8} {'bottom':>8} {'stop':>8}",
+        ]
+        for strategy in sorted(self.paths):
+            histogram = self.histogram(strategy)
+            lines.append(
+                f"{strategy:<20} {self.paths[strategy]:>8} "
+                f"{self.path_seconds[strategy] * 1000:>10.3f} {self.branch_seconds[strategy] * 1000:>10.3f} "
+                f"{histogram[BranchDecision.TOP]:>8} {histogram[BranchDecision.BOTTOM]:>8} "
+                f"{histogram[BranchDecision.STOP]:>8}"
+            )
+        return "\n".join(lines)
+
+
+def trace_path(route: Route, virus_type: VirusType, tracer: Tracer) -> None:
+    """
+    Same as route.follow_path(virus_type), calling the tracer at every step.
+    Kept separate so that follow_path without a tracer pays nothing for it.
+
+    :complexity: O(P) where P is the length of the path taken.
+    """
+    start = perf_counter()
+    rest_store_list = [route.store]
+
+    while len(rest_store_list):
+        next_store = rest_store_list.pop()
+
+        if isinstance(next_store, RouteSplit):
+            branch_start = perf_counter()
+            decision = virus_type.select_branch(next_store.top, next_store.bottom)
+            tracer.on_branch(virus_type, next_store, decision, perf_counter() - branch_start)
+            rest_store_list.append(next_store.following.store)
+
+            if decision == BranchDecision.TOP:
+                next_store = next_store.top.store
+            elif decision == BranchDecision.BOTTOM:
+                next_store = next_store.bottom.store
+            else:
+                tracer.on_stop(virus_type, next_store)
+                break
+
+        elif isinstance(next_store, RouteSeries):
+            tracer.on_series(virus_type, next_store)
+            virus_type.add_computer(next_store.computer)
+            next_store = next_store.following.store
+
+        else:
+            next_store = None
+
+        if next_store is not None:
+            rest_store_list.append(next_store)
+
+    tracer.on_finish(virus_type, perf_counter() - start)
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from ed_utils.decorators import number
+
+from async_traversal import afollow_paths
+from branch_decision import BranchDecision
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit
+from virus import AsyncVirusType, ThreatScoreVirus
+
+
+class StandInScorer:
+    """Scores computers by risk factor, yielding to the event loop like a daemon request would."""
+
+    def __init__(self):
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, computer):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        return computer.risk_factor
+
+
+class AsyncTopVirus(AsyncVirusType):
+    async def select_branch(self, top_branch, bottom_branch):
+        return BranchDecision.TOP
+
+
+class TestAsyncTraversal(unittest.TestCase):
+
+    def setUp(self):
+        self.a = Computer("a", 1, 1, 0.5)
+        self.safe = Computer("safe", 1, 1, 0.1)
+        self.risky = Computer("risky", 1, 1, 0.9)
+        self.after = Computer("after", 1, 1, 0.3)
+        # a, split(top: risky, bottom: safe), after, split(top: after, bottom: after).
+        self.route = Route(RouteSeries(self.a, Route(RouteSplit(
+            Route(RouteSeries(self.risky, Route(None))),
+            Route(RouteSeries(self.safe, Route(None))),
+            Route(RouteSeries(self.after, Route(RouteSplit(
+                Route(RouteSeries(self.after, Route(None))),
+                Route(RouteSeries(self.after, Route(None))),
+                Route(None),
+            )))),
+        ))))
+
+    @number("2.22")
+    def test_afollow_path(self):
+        scorer = StandInScorer()
+        virus = ThreatScoreVirus(scorer)
+        asyncio.run(self.route.afollow_path(virus))
+        # Takes the safe branch, then stops at the tie.
+        self.assertListEqual(virus.computers, [self.a, self.safe, self.after])
+        self.assertEqual(scorer.calls, 4)
+
+        virus = AsyncTopVirus()
+        asyncio.run(self.route.afollow_path(virus))
+        self.assertListEqual(virus.computers, [self.a, self.risky, self.after, self.after])
+
+    @number("2.23")
+    def test_afollow_paths_limit(self):
+        scorer = StandInScorer()
+        viruses = [ThreatScoreVirus(scorer) for _ in range(20)]
+        asyncio.run(afollow_paths(((self.route, virus) for virus in viruses), limit=3))
+        for virus in viruses:
+            self.assertListEqual(virus.computers, [self.a, self.safe, self.after])
+        self.assertEqual(scorer.calls, 20 * 4)
+        # Each following virus scores both branches at once.
+        self.assertEqual(scorer.max_in_flight, 2 * 3)
+
+        with self.assertRaises(ValueError):
+            asyncio.run(afollow_paths([], limit=0))
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from ed_utils.decorators import number
+
+from computer import Computer
+from disk_route import LazyRoute, RouteFile, write_route_file
+from route import Route, RouteSeries, RouteSplit
+from route_interner import RouteInterner
+from virus import TopVirus, BottomVirus, RiskAverseVirus, OptimalVirus
+
+
+class TestDiskRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "route.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_route(self, splits):
+        # A chain of splits, each with a computer on both branches and one after.
+        route = Route(None)
+        for i in range(splits):
+            top = Route(RouteSeries(Computer(f"top{i}", 1, i, 0.1), Route(None)))
+            bottom = Route(RouteSeries(Computer(f"bottom{i}", 2, i, 0.2), Route(None)))
+            following = Route(RouteSeries(Computer(f"after{i}", 3, i, 0.3), route))
+            route = Route(RouteSplit(top, bottom, following))
+        return route
+
+    @number("2.20")
+    def test_round_trip(self):
+        route = self.make_route(3)
+        self.assertEqual(write_route_file(route, self.path), 1 + 3 * 6)
+        with RouteFile(self.path) as route_file:
+            self.assertEqual(len(route_file), 19)
+            self.assertIsInstance(route_file.root, Route)
+            tokens, computers = route_file.root.to_tokens()
+            expected_tokens, expected_computers = route.to_tokens()
+            self.assertListEqual(tokens.tolist(), expected_tokens.tolist())
+            self.assertListEqual(computers, expected_computers)
+            self.assertEqual(route_file.root.summary(), route.summary())
+            self.assertIsInstance(route_file.root.store.top, LazyRoute)
+            with self.assertRaises(AttributeError):
+                route_file.root.store = None
+
+        # Shared routes are written once.
+        shared = Route(RouteSeries(Computer("shared", 1, 1, 0.1), Route(None)))
+        self.assertEqual(write_route_file(Route(RouteSplit(shared, shared, shared)), self.path), 3)
+
+        with open(self.path, "wb") as fp:
+            fp.write(b"not a route\n" + bytes(16))
+        with self.assertRaises(ValueError):
+            RouteFile(self.path)
+
+    @number("2.21")
+    def test_follow_path_bounded(self):
+        splits = 2000
+        route = self.make_route(splits)
+        write_route_file(route, self.path)
+
+        for virus_class in (TopVirus, BottomVirus, RiskAverseVirus):
+            with RouteFile(self.path, cache_size=16) as route_file:
+                expected = virus_class()
+                route.follow_path(expected)
+                virus = virus_class()
+                route_file.root.follow_path(virus)
+                self.assertListEqual(virus.computers, expected.computers)
+                # Only the path was read: per split, the split, one branch and its end, and what follows.
+                self.assertLessEqual(route_file.loads, splits * 5 + 1)
+                self.assertLess(route_file.loads, len(route_file))
+                self.assertLessEqual(route_file.resident(), 16)
+
+    @number("2.31")
+    def test_stable_identity(self):
+        splits = 300
+        route = self.make_route(splits)
+        write_route_file(route, self.path)
+
+        with RouteFile(self.path, cache_size=4) as route_file:
+            # Reading a node again after it left the cache gives back the same routes.
+            top = route_file.root.store.top
+            for _ in range(8):
+                route_file.node(len(route_file) - 1 - _)
+            self.assertIs(route_file.root.store.top, top)
+            self.assertIs(route_file.route(0), route_file.root)
+
+            compiled = route_file.root.compile()
+            self.assertEqual(len(compiled), len(route.compile()))
+            for virus_class in (TopVirus, BottomVirus, RiskAverseVirus):
+                expected = virus_class()
+                route.follow_path(expected)
+                virus = virus_class()
+                compiled.follow_path(virus)
+                self.assertListEqual(virus.computers, expected.computers)
+
+            # Tables keyed by the id of a route work on lazy routes.
+            expected = OptimalVirus(route)
+            route.follow_path(expected)
+            virus = OptimalVirus(route_file.root)
+            route_file.root.follow_path(virus)
+            self.assertListEqual(virus.computers, expected.computers)
+            self.assertEqual(len(RouteInterner().intern(route_file.root).add_all_computers()), route.count_computers())
@@ -1,6 +1,10 @@
+import os
+import tempfile
 import unittest
 from ed_utils.decorators import number
+from ed_utils.timeout import timeout
 
+from alphabet import Alphabet, BYTE, NIBBLE
 from infinite_hash_table import InfiniteHashTable
 
 
@@ -92,3 +96,138 @@ class TestInfiniteHash(unittest.TestCase):
             "mining"
         ]
         self.assertListEqual(res, expected)
+
+    @number("4.4")
+    def test_from_sorted(self):
+        pairs = [("lin", 1), ("leg", 2), ("mine", 3), ("linked", 4), ("limp", 5), ("mining", 6), ("jake", 7), ("linger", 8)]
+        incremental = InfiniteHashTable()
+        for key, value in pairs:
+            incremental[key] = value
+
+        ih = InfiniteHashTable.from_sorted(sorted(pairs))
+        self.assertEqual(len(ih), len(pairs))
+        for key, value in pairs:
+            self.assertEqual(ih[key], value)
+            self.assertEqual(ih.get_location(key), incremental.get_location(key))
+        self.assertListEqual(ih.sort_keys(), incremental.sort_keys())
+
+        # Later duplicates win, and the result can still be edited.
+        ih = InfiniteHashTable.from_sorted([("lin", 1), ("lin", 2), ("linked", 3)])
+        self.assertEqual(len(ih), 2)
+        self.assertEqual(ih["lin"], 2)
+        del ih["linked"]
+        self.assertEqual(ih.get_location("lin"), [4])
+
+    @number("4.5")
+    @timeout(20)
+    def test_long_keys(self):
+        # Keys sharing 100K characters need 100K levels, far past the recursion limit.
+        base = "a" * 100_000
+        keys = [base + "b", base + "c", base]
+        ih = InfiniteHashTable()
+        for i, key in enumerate(keys):
+            ih[key] = i
+        self.assertEqual(len(ih), 3)
+        self.assertEqual(ih[base + "c"], 1)
+        self.assertEqual(len(ih.get_location(base)), 100_001)
+        self.assertListEqual(ih.sort_keys(), sorted(keys))
+
+        built = InfiniteHashTable.from_sorted(sorted((key, i) for i, key in enumerate(keys)))
+        self.assertEqual(built.get_location(base + "b"), ih.get_location(base + "b"))
+
+        del ih[base + "c"]
+        del ih[base]
+        self.assertEqual(ih.get_location(base + "b"), [19])
+        self.assertEqual(len(ih), 1)
+
+    @number("4.6")
+    def test_freeze(self):
+        ih = InfiniteHashTable()
+        for key, value in [("lin", 1), ("leg", 2), ("mine", 3), ("linked", 4), ("limp", 5), ("mining", 6), ("jake", 7), ("linger", 8)]:
+            ih[key] = value
+        frozen = ih.freeze()
+
+        self.assertEqual(len(frozen), 8)
+        self.assertEqual(frozen["linked"], 4)
+        self.assertIn("mine", frozen)
+        self.assertNotIn("min", frozen)
+        self.assertRaises(KeyError, lambda: frozen["lint"])
+        self.assertEqual(frozen.get_location("lin"), [4, 1, 6, 26])
+        self.assertListEqual(frozen.sort_keys(), ih.sort_keys())
+        self.assertListEqual(list(frozen.iter_prefix("lin")), [("lin", 1), ("linger", 8), ("linked", 4)])
+        self.assertListEqual(list(frozen.iter_prefix("mini")), [("mining", 6)])
+        self.assertListEqual(list(frozen.iter_prefix("x")), [])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.bin")
+            frozen.save(path)
+            loaded = type(frozen).load(path)
+        self.assertListEqual(list(loaded.iter_prefix()), list(frozen.iter_prefix()))
+        self.assertEqual(loaded.get_location("mining"), [5, 1, 6, 1])
+
+    @number("4.7")
+    def test_alphabets(self):
+        # 'Z' (90) and 't' (116) share a position with 26 letters, but not with every byte.
+        self.assertRaises(ValueError, lambda: InfiniteHashTable.from_sorted([("Z", 1), ("t", 2)]))
+        ih = InfiniteHashTable()
+        ih["t"] = 2
+        self.assertRaises(ValueError, lambda: ih.__setitem__("Z", 1))
+        self.assertEqual(ih.get_location("t"), [12])
+        self.assertEqual(len(ih), 1)
+
+        byte_table = InfiniteHashTable.with_alphabet(BYTE)()
+        self.assertEqual(byte_table.TABLE_SIZE, 257)
+        byte_table["Z"] = 1
+        byte_table["t"] = 2
+        byte_table["tin"] = 3
+        self.assertEqual(byte_table.get_location("Z"), [90])
+        self.assertEqual(byte_table.get_location("tin"), [116, 105])
+        self.assertListEqual(byte_table.sort_keys(), ["Z", "t", "tin"])
+
+        nibble_table = InfiniteHashTable.with_alphabet(NIBBLE)()
+        for i, key in enumerate(["é", "e", "ü"]):
+            nibble_table[key.encode()] = i
+        self.assertEqual(nibble_table.get_location(b"e"), [6])
+        self.assertEqual(nibble_table.get_location("é".encode()), [12, 3, 10])
+        self.assertEqual(nibble_table.get_location("ü".encode()), [12, 3, 11])
+        self.assertListEqual(nibble_table.sort_keys(), sorted(key.encode() for key in ["é", "e", "ü"]))
+        frozen = nibble_table.freeze()
+        self.assertEqual(frozen["ü".encode()], 2)
+        self.assertListEqual(frozen.sort_keys(), nibble_table.sort_keys())
+
+        dna = Alphabet(4, {"a": 0, "c": 1, "g": 2, "t": 3})
+        dna_table = InfiniteHashTable.with_alphabet(dna).from_sorted([("gat", 1), ("gta", 2), ("tag", 3)])
+        self.assertEqual(dna_table.get_location("gta"), [2, 3])
+        self.assertRaises(ValueError, lambda: dna_table.__setitem__("gun", 4))
+        self.assertNotIn("gun", dna_table)
+        self.assertNotIn("gun", dna_table.freeze())
+
+        # A key outside the alphabet colliding with one already there leaves the table unchanged.
+        byte_table["ab"] = 4
+        self.assertRaises(ValueError, lambda: byte_table.__setitem__("a\u4e00", 5))
+        self.assertEqual(byte_table["ab"], 4)
+        self.assertEqual(byte_table.get_location("ab"), [97])
+        self.assertEqual(len(byte_table), 4)
+        self.assertNotIn("a\u4e00", byte_table)
+        dna_table["ga"] = 5
+        self.assertRaises(ValueError, lambda: dna_table.__setitem__("gx", 6))
+        self.assertIn("ga", dna_table)
+        self.assertEqual(dna_table["ga"], 5)
+        self.assertEqual(len(dna_table), 4)
+
+        class BadTable(InfiniteHashTable):
+            TABLE_SIZE = 13
+        self.assertRaises(ValueError, BadTable)
+
+    @number("4.8")
+    def test_get_many(self):
+        ih = InfiniteHashTable()
+        for key, value in [("lin", 1), ("leg", 2), ("mine", 3), ("linked", 4), ("limp", 5), ("mining", 6), ("jake", 7), ("linger", 8)]:
+            ih[key] = value
+
+        keys = ["mining", "lin", "jake", "linked", "lin", "limp", "linger"]
+        self.assertListEqual(ih.get_many(keys), [ih[key] for key in keys])
+        self.assertListEqual(ih.get_location_many(keys), [ih.get_location(key) for key in keys])
+        self.assertListEqual(ih.get_many([]), [])
+        self.assertRaises(KeyError, lambda: ih.get_many(["lin", "lint"]))
+        self.assertRaises(KeyError, lambda: ih.get_location_many(["li"]))
@@ -0,0 +1,71 @@
+import unittest
+from ed_utils.decorators import number
+
+from computer import Computer
+from monte_carlo import np, simulate_trials
+from route import Route, RouteSeries, RouteSplit
+from virus import ProbabilisticVirus, TopVirus
+
+
+@unittest.skipIf(np is None, "NumPy is not installed.")
+class TestMonteCarlo(unittest.TestCase):
+
+    def setUp(self):
+        self.a = Computer("a", 1, 1, 0.1)
+        self.b = Computer("b", 1, 10, 0.1)
+        self.c = Computer("c", 1, 20, 0.1)
+        self.d = Computer("d", 1, 5, 0.1)
+        # a, split(top: b, bottom: c), d.
+        self.route = Route(RouteSeries(self.a, Route(RouteSplit(
+            Route(RouteSeries(self.b, Route(None))),
+            Route(RouteSeries(self.c, Route(None))),
+            Route(RouteSeries(self.d, Route(None))),
+        ))))
+
+    @number("2.24")
+    def test_distribution(self):
+        virus = ProbabilisticVirus(0.25, 0.5)
+        result = simulate_trials(self.route.compile(), virus, 200_000, seed=46, batch_size=30_000)
+        self.assertEqual(result.trials, 200_000)
+        # Stop (1), top (16) or bottom (26).
+        self.assertSetEqual(set(np.unique(result.values).tolist()), {1, 16, 26})
+        self.assertAlmostEqual(result.mean(), 1 + 0.25 * 15 + 0.5 * 25, delta=0.1)
+        self.assertEqual(result.percentile(10), 1)
+        self.assertEqual(result.percentile(90), 26)
+        self.assertListEqual(result.computers, [self.a, self.d, self.b, self.c])
+        expected_rates = [1, 0.75, 0.25, 0.5]
+        for rate, expected in zip(result.hit_rates().tolist(), expected_rates):
+            self.assertAlmostEqual(rate, expected, delta=0.01)
+
+        # One trial at a time agrees.
+        total = 0
+        virus = ProbabilisticVirus(0.25, 0.5, seed=46)
+        for _ in range(4000):
+            virus.computers = []
+            self.route.follow_path(virus)
+            total += sum(computer.hacked_value for computer in virus.computers)
+        self.assertAlmostEqual(total / 4000, result.mean(), delta=0.6)
+
+        with self.assertRaises(ValueError):
+            ProbabilisticVirus(0.75, 0.5)
+        with self.assertRaises(ValueError):
+            simulate_trials(self.route.compile(), virus, 0)
+
+    @number("2.25")
+    def test_nested_and_shared(self):
+        # Certain choices give the same path as a deterministic virus.
+        result = simulate_trials(self.route.compile(), ProbabilisticVirus(1, 0), 10)
+        top = TopVirus()
+        self.route.follow_path(top)
+        self.assertListEqual(result.values.tolist(), [sum(c.hacked_value for c in top.computers)] * 10)
+        self.assertListEqual(result.hit_rates().tolist(), [1, 1, 1, 0])
+
+        # Deeply nested splits sharing their branches, so the return stack has to grow.
+        final = Computer("final", 1, 1, 0.1)
+        tail = Route(RouteSeries(final, Route(None)))
+        route = Route(None)
+        for i in range(50):
+            route = Route(RouteSplit(route, route, Route(RouteSeries(Computer(str(i), 1, i, 0.1), tail))))
+        result = simulate_trials(route.compile(), ProbabilisticVirus(), 1000, seed=1, batch_size=300)
+        self.assertListEqual(np.unique(result.values).tolist(), [sum(range(50)) + 50])
+        self.assertEqual(result.hit_rates()[result.computers.index(final)], 50)
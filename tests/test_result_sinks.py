@@ -0,0 +1,59 @@
+import random
+import unittest
+from ed_utils.decorators import number
+
+from computer import Computer
+from result_sinks import AggregateSink, CallbackSink, TopKSink
+from route import Route, RouteSummary
+from virus import TopVirus, BottomVirus, OptimalVirus
+
+
+class TestResultSinks(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(50)
+        self.computers = [
+            Computer(str(i), rng.randint(0, 9), rng.randint(0, 20), rng.choice([0.0, 0.5, 1.0]))
+            for i in range(2000)
+        ]
+        self.route = Route.build(self.computers)
+
+    @number("2.28")
+    def test_aggregate_sink(self):
+        expected = TopVirus()
+        self.route.follow_path(expected)
+
+        sink = AggregateSink()
+        virus = TopVirus(sink)
+        self.route.follow_path(virus)
+        self.assertIs(virus.computers, sink)
+        self.assertEqual(len(sink), len(expected.computers))
+        self.assertEqual(sink.summary(), RouteSummary.combine([RouteSummary.of_computer(c) for c in expected.computers]))
+        self.assertEqual(AggregateSink().summary(), RouteSummary())
+
+        # Works the same when compiled, and for viruses with their own arguments.
+        sink = AggregateSink()
+        self.route.compile().follow_path(OptimalVirus(self.route, sink=sink))
+        self.assertEqual(sink.total_hacked_value, self.route.summary().total_hacked_value)
+
+    @number("2.29")
+    def test_top_k_and_callback(self):
+        sink = TopKSink(10)
+        self.route.follow_path(BottomVirus(sink))
+        expected = sorted(self.computers, key=lambda c: c.hacked_value, reverse=True)[:10]
+        self.assertListEqual(sink.items(), expected)
+        self.assertEqual(len(sink), 10)
+        self.assertEqual(sink.added, len(self.computers))
+
+        sink = TopKSink(3, key=lambda c: -c.risk_factor)
+        self.route.follow_path(TopVirus(sink))
+        self.assertListEqual(sink.items(), [c for c in self.computers if c.risk_factor == 0.0][:3])
+
+        seen = []
+        sink = CallbackSink(lambda computer: seen.append(computer.name))
+        self.route.follow_path(TopVirus(sink))
+        self.assertListEqual(seen, [c.name for c in self.computers])
+        self.assertEqual(len(sink), len(self.computers))
+
+        with self.assertRaises(ValueError):
+            TopKSink(0)
@@ -0,0 +1,61 @@
+import unittest
+from ed_utils.decorators import number
+
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit, SPLIT_TOKEN
+
+
+class TestRouteDigest(unittest.TestCase):
+
+    def make_route(self, hacked_value=2):
+        a = Computer("a", 1, hacked_value, 0.1)
+        b = Computer("b", 3, 4, 0.0)
+        return Route(RouteSeries(a, Route(RouteSplit(
+            Route(RouteSeries(b, Route(None))),
+            Route(None),
+            Route(RouteSeries(a, Route(None))),
+        ))))
+
+    @number("1.7")
+    def test_equality(self):
+        route = self.make_route()
+        same = self.make_route()
+        different = self.make_route(hacked_value=3)
+        self.assertEqual(route, same)
+        self.assertEqual(hash(route), hash(same))
+        self.assertEqual(route.digest(), same.digest())
+        self.assertNotEqual(route, different)
+        self.assertNotEqual(route.store.following, route)
+        self.assertNotEqual(route, None)
+        # Top and bottom are not interchangeable.
+        split = route.store.following.store
+        self.assertNotEqual(Route(RouteSplit(split.bottom, split.top, split.following)), route.store.following)
+
+        # Numbers compare by value, as the computers themselves do.
+        as_ints = Route(RouteSeries(Computer("a", 1, 2, 0), Route()))
+        as_floats = Route(RouteSeries(Computer("a", 1.0, 2.0, 0.0), Route()))
+        self.assertEqual(as_ints.store.computer, as_floats.store.computer)
+        self.assertEqual(as_ints, as_floats)
+        self.assertEqual(hash(as_ints), hash(as_floats))
+        self.assertNotEqual(as_ints, Route(RouteSeries(Computer("a", 1, 2, 0.5), Route())))
+        self.assertNotEqual(as_ints, Route(RouteSeries(Computer("b", 1, 2, 0), Route())))
+
+        # Deduplicating by hash.
+        self.assertEqual(len({route, same, different, Route(None), Route(None)}), 3)
+
+        # Changing a sub-route changes the digest of every route it is in, but not the others.
+        edited = route.edit_at(["following", "top"], lambda r: r.add_computer_before(Computer("c", 1, 1, 0.5)))
+        self.assertNotEqual(edited, route)
+        self.assertNotEqual(edited.store.following.store.top, split.top)
+        self.assertEqual(edited.store.following.store.bottom.digest(), split.bottom.digest())
+
+    @number("1.8")
+    def test_deep_equality(self):
+        a = Computer("a", 1, 1, 0.1)
+        spec = [SPLIT_TOKEN, a] * 30_000
+        route = Route.build(spec)
+        same = Route.build(spec)
+        # Would overflow the stack if compared recursively.
+        self.assertEqual(route, same)
+        self.assertNotEqual(route, Route.build(spec + [a]))
+        self.assertEqual(route.store.top._digest, same.store.top._digest)
@@ -113,3 +113,36 @@ class TestRouteMethods(unittest.TestCase):
         self.assertIsInstance(res, RouteSeries)
         self.assertEqual(res.computer, m)
         self.assertEqual(res.following.store, None)
+
+    @number("1.6")
+    def test_edit_at(self):
+        a, b, c, d, e = (Computer(letter, 5, 5, 1.0) for letter in "abcde")
+        top = Route(RouteSeries(b, Route(None)))
+        bottom = Route(RouteSeries(c, Route(None)))
+        route = Route(RouteSeries(a, Route(RouteSplit(top, bottom, Route(RouteSeries(d, Route(None)))))))
+
+        res1 = route.edit_at(["following", "top"], lambda r: Route(r.store.add_computer_after(e)))
+        split = res1.store.following.store
+        self.assertEqual(res1.store.computer, a)
+        self.assertEqual(split.top.store.following.store.computer, e)
+        # Everything off the path is shared, and the original is unchanged.
+        self.assertIs(split.bottom, bottom)
+        self.assertIs(split.following, route.store.following.store.following)
+        self.assertIsNone(top.store.following.store)
+
+        res2 = route.edit_at(["following", "following", "following"], lambda r: r.add_computer_before(e))
+        self.assertEqual(res2.store.following.store.following.store.following.store.computer, e)
+        self.assertIs(res2.store.following.store.top, top)
+
+        res3 = route.edit_at([], lambda r: r.add_empty_branch_before())
+        self.assertIs(res3.store.following, route)
+
+        self.assertRaises(ValueError, lambda: route.edit_at(["top"], lambda r: r))
+        self.assertRaises(ValueError, lambda: route.edit_at(["following", "following", "following", "following"], lambda r: r))
+
+        # Deep routes don't hit the recursion limit.
+        deep = Route(None)
+        for _ in range(50_000):
+            deep = deep.add_computer_before(a)
+        res4 = deep.edit_at(["following"] * 50_000, lambda r: r.add_computer_before(e))
+        self.assertEqual(res4.count_computers(), 50_001)
@@ -0,0 +1,38 @@
+import unittest
+from ed_utils.decorators import number
+
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit
+from route_interner import RouteInterner
+
+
+class TestRouteInterner(unittest.TestCase):
+
+    @number("1.5")
+    def test_intern(self):
+        interner = RouteInterner()
+        a = Computer("a", 1, 2, 0.1)
+        b = Computer("b", 3, 4, 0.2)
+
+        def build():
+            # Built independently each time, with new but equal computers.
+            return Route(RouteSplit(
+                Route(RouteSeries(Computer("a", 1, 2, 0.1), Route(None))),
+                Route(None),
+                Route(RouteSeries(Computer("b", 3, 4, 0.2), Route(RouteSeries(Computer("a", 1, 2, 0.1), Route(None))))),
+            ))
+
+        first = interner.intern(build())
+        second = interner.intern(build())
+        self.assertIs(first, second)
+        self.assertEqual(first, build())
+        self.assertIs(first.store.bottom, interner.empty)
+        # The top branch is the same as the end of the following route.
+        self.assertIs(first.store.top, first.store.following.store.following)
+        self.assertEqual(len(interner), 3)
+
+        built = interner.add_empty_branch_before(interner.add_computer_before(interner.empty, a))
+        self.assertIs(built.store.top, interner.empty)
+        self.assertIs(built.store.following, first.store.top)
+        self.assertIs(interner.series(b, interner.series(a, interner.empty)), first.store.following)
+        self.assertIs(interner.intern(Route(None)), interner.empty)
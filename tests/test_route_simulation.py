@@ -0,0 +1,74 @@
+import multiprocessing
+import unittest
+from ed_utils.decorators import number
+
+from computer import Computer
+from result_sinks import AggregateSink
+from route import Route, RouteSeries, RouteSplit
+from route_simulation import pack_route, unpack_route, simulate
+from virus import TopVirus, BottomVirus, LazyVirus, RiskAverseVirus
+
+
+class TestRouteSimulation(unittest.TestCase):
+
+    def make_routes(self):
+        a, b, c, d = (Computer(letter, i, 2 * i, 0.1 * i) for i, letter in enumerate("abcd"))
+        return [
+            Route(None),
+            Route(RouteSeries(a, Route(RouteSplit(
+                Route(RouteSeries(b, Route(None))),
+                Route(RouteSeries(c, Route(None))),
+                Route(RouteSeries(d, Route(RouteSeries(a, Route(None))))),
+            )))),
+            Route(RouteSplit(Route(None), Route(RouteSeries(d, Route(None))), Route(None))),
+        ]
+
+    @number("2.8")
+    def test_tokens(self):
+        for route in self.make_routes():
+            tokens, computers = route.to_tokens()
+            self.assertEqual(Route.from_tokens(tokens, computers), route)
+            rebuilt, _ = unpack_route(pack_route(route)[0])
+            self.assertEqual(rebuilt, route)
+
+        # The repeated computer is only stored once.
+        tokens, computers = self.make_routes()[1].to_tokens()
+        self.assertEqual(len(computers), 4)
+        self.assertEqual(list(tokens), [0, -2, 1, -1, 2, -1, 3, 0, -1])
+
+    @number("2.9")
+    def test_simulate(self):
+        routes = self.make_routes() * 3
+        virus_types = [TopVirus, BottomVirus, LazyVirus, RiskAverseVirus]
+        expected = []
+        for route in routes:
+            row = []
+            for virus_type in virus_types:
+                virus = virus_type()
+                route.follow_path(virus)
+                row.append(virus.computers)
+            expected.append(row)
+
+        self.assertEqual(simulate(routes, virus_types, processes=1), expected)
+        results = simulate(routes, virus_types, processes=2, chunk_size=2)
+        self.assertEqual(results, expected)
+        # Results refer to the original computers, not copies.
+        self.assertIs(results[1][0][0], routes[1].store.computer)
+        # Workers which aren't forked are sent the routes instead.
+        results = simulate(routes, virus_types, processes=2, mp_context=multiprocessing.get_context("spawn"))
+        self.assertEqual(results, expected)
+        self.assertIs(results[1][0][0], routes[1].store.computer)
+
+        # With a sink type, the filled sinks are sent back instead.
+        expected_summaries = []
+        for row in expected:
+            expected_summaries.append([])
+            for computers in row:
+                sink = AggregateSink()
+                for computer in computers:
+                    sink.append(computer)
+                expected_summaries[-1].append(sink.summary())
+        for processes, mp_context in ((1, None), (2, None), (2, multiprocessing.get_context("spawn"))):
+            results = simulate(routes, virus_types, processes=processes, mp_context=mp_context, sink_type=AggregateSink)
+            self.assertIsInstance(results[1][0], AggregateSink)
+            self.assertEqual([[sink.summary() for sink in row] for row in results], expected_summaries)
@@ -0,0 +1,119 @@
+import io
+import unittest
+from ed_utils.decorators import number
+
+import route as route_module
+from route_simulation import simulate
+from virus import TopVirus, BottomVirus
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit, EMPTY_TOKEN, SPLIT_TOKEN, FIRST_REF_TOKEN
+
+
+class TestRouteStorage(unittest.TestCase):
+
+    def make_route(self):
+        self.a = Computer("a", 1, 2, 0.1)
+        self.b = Computer("b", 3, 4, 0.0)
+        return Route(RouteSeries(self.a, Route(RouteSplit(
+            Route(RouteSeries(self.b, Route(None))),
+            Route(None),
+            Route(RouteSeries(self.a, Route(RouteSplit(Route(None), Route(None), Route(None))))),
+        ))))
+
+    @number("2.11")
+    def test_dump_load(self):
+        route = self.make_route()
+        fp = io.StringIO()
+        route.dump(fp)
+        fp.seek(0)
+        loaded = Route.load(fp)
+        self.assertEqual(loaded, route)
+        # The shared computer is stored once, and loaded as one computer.
+        self.assertIs(loaded.store.computer, loaded.store.following.store.following.store.computer)
+
+        self.assertRaises(ValueError, lambda: Route.load(io.StringIO("")))
+        self.assertRaises(ValueError, lambda: Route.load(io.StringIO('{"format": "other"}\n')))
+        truncated = io.StringIO(fp.getvalue().splitlines()[0] + "\n" + '[[], [-2, -1]]\n')
+        self.assertRaises(ValueError, lambda: Route.load(truncated))
+
+    @number("2.12")
+    def test_dump_load_deep(self):
+        deep = Route(None)
+        for i in range(100_000):
+            deep = deep.add_computer_before(Computer(str(i % 1000), i % 7, i % 11, 0.5))
+            if i % 1000 == 0:
+                deep = deep.add_empty_branch_before()
+        fp = io.StringIO()
+        deep.dump(fp)
+        lines = fp.getvalue().splitlines()
+        self.assertGreater(len(lines), 100_000 // route_module.DUMP_CHUNK_SIZE)
+        fp.seek(0)
+        loaded = Route.load(fp)
+        self.assertEqual(loaded.count_computers(), 100_000)
+        self.assertListEqual(list(loaded.iter_computers("dfs")), list(deep.iter_computers("dfs")))
+
+    @number("2.27")
+    def test_build(self):
+        route = self.make_route()
+        tokens, computers = route.to_tokens()
+        spec = [computers[token] if token >= 0 else token for token in tokens]
+        self.assertEqual(Route.build(spec), route)
+        self.assertEqual(Route.build(iter(spec)), route)
+
+        # Unfinished routes at the end are empty.
+        a, b = self.a, self.b
+        expected = Route(RouteSeries(a, Route(RouteSplit(
+            Route(RouteSeries(b, Route(None))),
+            Route(None),
+            Route(RouteSeries(a, Route(None))),
+        ))))
+        self.assertEqual(Route.build([a, SPLIT_TOKEN, b, None, None, a]), expected)
+        self.assertEqual(Route.build([a, SPLIT_TOKEN, b, EMPTY_TOKEN, EMPTY_TOKEN, a, EMPTY_TOKEN]), expected)
+        self.assertEqual(Route.build([]), Route(None))
+
+        # Deep routes are built without recursion.
+        deep = Route.build([SPLIT_TOKEN] * 100_000 + [a])
+        tokens, computers = deep.to_tokens()
+        self.assertEqual(len(tokens), 100_000 * 3 + 2)
+        self.assertListEqual(computers, [a])
+
+        with self.assertRaises(ValueError):
+            Route.build([a, None, b])
+        with self.assertRaises(ValueError):
+            Route.build([a, "split"])
+
+    @number("2.30")
+    def test_shared_routes(self):
+        # Nested splits whose branches are the same route, 2^22 copies of the innermost route as a tree.
+        computer = Computer("c", 1, 1, 0.1)
+        route = Route(RouteSeries(computer, Route(None)))
+        for _ in range(22):
+            route = Route(RouteSplit(route, route, Route(RouteSeries(computer, Route(None)))))
+
+        tokens, computers = route.to_tokens()
+        # Each split, then its top, a reference for its bottom, and its following.
+        self.assertEqual(len(tokens), 2 + 22 * 4)
+        self.assertEqual(tokens[:24].tolist(), [SPLIT_TOKEN] * 22 + [0, EMPTY_TOKEN])
+        self.assertEqual(tokens[24], FIRST_REF_TOKEN - 22)
+        rebuilt = Route.from_tokens(tokens, computers)
+        self.assertEqual(rebuilt, route)
+        self.assertIs(rebuilt.store.top, rebuilt.store.bottom)
+        self.assertEqual(rebuilt.count_computers(), route.count_computers())
+
+        fp = io.StringIO()
+        route.dump(fp)
+        fp.seek(0)
+        loaded = Route.load(fp)
+        self.assertEqual(loaded, route)
+        self.assertIs(loaded.store.bottom, loaded.store.top)
+
+        # Small enough to send to another process.
+        results = simulate([route], [TopVirus, BottomVirus], processes=1)
+        for virus_type, computers in zip([TopVirus, BottomVirus], results[0]):
+            virus = virus_type()
+            route.follow_path(virus)
+            self.assertListEqual(computers, virus.computers)
+
+        # A reference must be to a route already read.
+        with self.assertRaises(ValueError):
+            Route.from_tokens([SPLIT_TOKEN, FIRST_REF_TOKEN - 1, EMPTY_TOKEN, EMPTY_TOKEN], [])
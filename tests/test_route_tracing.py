@@ -0,0 +1,77 @@
+import unittest
+from ed_utils.decorators import number
+
+from branch_decision import BranchDecision
+from computer import Computer
+from route import Route, RouteSeries, RouteSplit
+from route_tracing import Tracer, TraceCollector
+from virus import TopVirus, BottomVirus, LazyVirus
+
+
+class RecordingTracer(Tracer):
+
+    def __init__(self):
+        self.events = []
+
+    def on_series(self, virus_type, series):
+        self.events.append(("series", series.computer.name))
+
+    def on_branch(self, virus_type, split, decision, seconds):
+        self.events.append(("branch", decision))
+
+    def on_stop(self, virus_type, split):
+        self.events.append(("stop",))
+
+
+class TestRouteTracing(unittest.TestCase):
+
+    def setUp(self):
+        self.a = Computer("a", 1, 2, 0.1)
+        self.b = Computer("b", 3, 4, 0.0)
+        self.c = Computer("c", 2, 1, 0.2)
+        self.d = Computer("d", 3, 1, 0.5)
+        # a, then split(top: b, bottom: d), then c.
+        self.route = Route(RouteSeries(self.a, Route(RouteSplit(
+            Route(RouteSeries(self.b, Route(None))),
+            Route(RouteSeries(self.d, Route(None))),
+            Route(RouteSeries(self.c, Route(None))),
+        ))))
+
+    @number("2.18")
+    def test_tracer_events(self):
+        tracer = RecordingTracer()
+        virus = TopVirus()
+        self.route.follow_path(virus, tracer)
+        self.assertListEqual(virus.computers, [self.a, self.b, self.c])
+        self.assertListEqual(tracer.events, [
+            ("series", "a"), ("branch", BranchDecision.TOP), ("series", "b"), ("series", "c"),
+        ])
+
+        tracer = RecordingTracer()
+        virus = LazyVirus()
+        self.route.follow_path(virus, tracer)
+        self.assertListEqual(virus.computers, [self.a])
+        self.assertListEqual(tracer.events, [("series", "a"), ("branch", BranchDecision.STOP), ("stop",)])
+
+    @number("2.19")
+    def test_trace_collector(self):
+        collector = TraceCollector()
+        for virus_class in (TopVirus, TopVirus, BottomVirus, LazyVirus):
+            traced = virus_class()
+            self.route.follow_path(traced, collector)
+            untraced = virus_class()
+            self.route.follow_path(untraced)
+            self.assertListEqual(traced.computers, untraced.computers)
+
+        self.assertEqual(collector.series_count, 3 + 3 + 3 + 1)
+        self.assertEqual(collector.split_count, 4)
+        self.assertEqual(collector.stop_count, 1)
+        self.assertEqual(collector.paths["TopVirus"], 2)
+        self.assertDictEqual(collector.histogram("TopVirus"), {
+            BranchDecision.TOP: 2, BranchDecision.BOTTOM: 0, BranchDecision.STOP: 0,
+        })
+        self.assertEqual(collector.histogram("LazyVirus")[BranchDecision.STOP], 1)
+        self.assertGreaterEqual(collector.path_seconds["BottomVirus"], collector.branch_seconds["BottomVirus"])
+        report = collector.report()
+        for strategy in ("TopVirus", "BottomVirus", "LazyVirus"):
+            self.assertIn(strategy, report)
@@ -1,9 +1,14 @@
+import json
+import random
 import unittest
 from ed_utils.decorators import number
 
+from algorithms.rpn import compile_rpn
+from compiled_route import RouteStepper
 from computer import Computer
 from route import Route, RouteSeries, RouteSplit
-from virus import VirusType, TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus, BranchDecision
+from route_interner import RouteInterner
+from virus import np, VirusType, ProbabilisticVirus, TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus, OptimalVirus, BranchDecision
 
 
 class TestRouteMethods(unittest.TestCase):
@@ -126,3 +131,314 @@ class TestRouteMethods(unittest.TestCase):
             self.top_bot, self.top_top, self.top_mid,
             self.bot_one, self.bot_two, self.final
         ])))
+
+    @number("2.6")
+    def test_compiled_route(self):
+        for example in (self.load_example, self.large_example):
+            example()
+            plan = self.route.compile()
+            for virus_type in (TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus):
+                expected = virus_type()
+                self.route.follow_path(expected)
+                compiled = virus_type()
+                plan.follow_path(compiled)
+                # Running a plan again should give the same path again.
+                plan.follow_path(compiled)
+                self.assertListEqual(compiled.computers, expected.computers * 2)
+
+        self.load_example()
+        self.assertEqual(len(Route(None).compile()), 1)
+
+    @number("2.7")
+    def test_follow_paths(self):
+        class CustomWalker(VirusType):
+            def __init__(self, choices) -> None:
+                super().__init__()
+                self.choices = list(choices)
+            def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+                return self.choices.pop(0)
+
+        top, bottom, stop = BranchDecision.TOP, BranchDecision.BOTTOM, BranchDecision.STOP
+        choices = [[top, top, bottom], [top, bottom, top], [bottom, top, top], [bottom, stop], [stop], [top, stop]]
+        for example in (self.load_example, self.large_example):
+            example()
+            fleet = [virus_type() for virus_type in (TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus)]
+            fleet += [CustomWalker(c) for c in choices]
+            expected = [type(virus)() if not isinstance(virus, CustomWalker) else CustomWalker(virus.choices) for virus in fleet]
+            for virus in expected:
+                self.route.follow_path(virus)
+            self.route.follow_paths(fleet)
+            for virus, single in zip(fleet, expected):
+                self.assertListEqual(virus.computers, single.computers)
+
+    @number("2.10")
+    def test_iter_computers(self):
+        self.load_example()
+        self.assertListEqual(list(self.route.iter_computers()), [
+            self.bot_one, self.final, self.top_top, self.top_bot, self.top_mid, self.bot_two,
+        ])
+        self.assertListEqual(list(self.route.iter_computers("dfs")), [
+            self.top_top, self.top_bot, self.top_mid, self.bot_one, self.bot_two, self.final,
+        ])
+        self.assertListEqual(self.route.add_all_computers(), list(self.route.iter_computers("bfs")))
+        self.assertEqual(self.route.count_computers(), 6)
+        self.assertEqual(Route(None).count_computers(), 0)
+        self.assertRaises(ValueError, lambda: list(self.route.iter_computers("random")))
+
+        # Stopping early.
+        computers = self.route.iter_computers()
+        self.assertEqual(next(computers), self.bot_one)
+
+        # Deep routes don't hit the recursion limit.
+        deep = Route(None)
+        for i in range(100_000):
+            deep = deep.add_computer_before(self.final)
+        self.assertEqual(deep.count_computers(), 100_000)
+
+    @number("2.13")
+    def test_summary(self):
+        self.load_example()
+        summary = self.route.summary()
+        self.assertEqual(summary.count, 6)
+        self.assertEqual(summary.total_hacked_value, 3 + 5 + 7 + 5 + 0 + 4)
+        self.assertEqual(summary.min_hacking_difficulty, 0)
+        self.assertEqual(summary.max_risk_factor, 0.6)
+
+        # Sub-routes are summarised along the way.
+        top_branch = self.route.store.top
+        self.assertIsNotNone(top_branch._summary)
+        self.assertEqual(top_branch.summary().count, 3)
+        self.assertEqual(top_branch.summary().min_hacking_difficulty, 3)
+        self.assertEqual(top_branch.summary().max_risk_factor, 0.3)
+        self.assertIs(self.route.summary(), summary)
+
+        empty = Route(None).summary()
+        self.assertEqual((empty.count, empty.total_hacked_value), (0, 0))
+        self.assertIsNone(empty.min_hacking_difficulty)
+        self.assertIsNone(empty.max_risk_factor)
+
+        deep = Route(None)
+        for i in range(100_000):
+            deep = deep.add_computer_before(Computer("c", i, 1, 0.1))
+        self.assertEqual(deep.summary().total_hacked_value, 100_000)
+        self.assertEqual(deep.summary().min_hacking_difficulty, 0)
+
+    @number("2.14")
+    def test_optimal_virus(self):
+        def best_total(routes, max_computer_risk):
+            """Best total over every possible path, found by trying them all."""
+            if not routes:
+                return 0
+            store, rest = routes[0].store, routes[1:]
+            if store is None:
+                return best_total(rest, max_computer_risk)
+            if isinstance(store, RouteSeries):
+                if max_computer_risk is not None and store.computer.risk_factor > max_computer_risk:
+                    return float("-inf")
+                return store.computer.hacked_value + best_total((store.following,) + rest, max_computer_risk)
+            return max(
+                0,
+                best_total((store.top, store.following) + rest, max_computer_risk),
+                best_total((store.bottom, store.following) + rest, max_computer_risk),
+            )
+
+        def random_route(rng, size):
+            routes = [Route(None)]
+            for i in range(size):
+                if len(routes) >= 3 and rng.random() < 0.4:
+                    routes.append(Route(RouteSplit(routes.pop(), routes.pop(), routes.pop())))
+                else:
+                    computer = Computer(str(i), rng.randint(0, 5), rng.randint(0, 9), rng.choice([0.0, 0.5, 1.0]))
+                    routes.append(Route(RouteSeries(computer, routes.pop() if routes else Route(None))))
+                if rng.random() < 0.3:
+                    routes.append(Route(None))
+            route = routes.pop()
+            while routes:
+                route = Route(RouteSplit(routes.pop(), Route(None), route))
+            return route
+
+        rng = random.Random(1008)
+        for _ in range(200):
+            route = random_route(rng, rng.randint(0, 12))
+            for max_computer_risk in (None, 0.5, 0.0):
+                virus = OptimalVirus(route, max_computer_risk=max_computer_risk)
+                route.follow_path(virus)
+                expected = best_total((route,), max_computer_risk)
+                self.assertEqual(virus.best_score(), expected)
+                if expected != float("-inf"):
+                    self.assertEqual(sum(c.hacked_value for c in virus.computers), expected)
+                    self.assertTrue(all(max_computer_risk is None or c.risk_factor <= max_computer_risk for c in virus.computers))
+
+        def random_dag(rng, size):
+            # Parts are picked with replacement, so they can be shared by several routes.
+            routes = [Route(None)]
+            for i in range(size):
+                if rng.random() < 0.4:
+                    routes.append(Route(RouteSplit(rng.choice(routes), rng.choice(routes), rng.choice(routes))))
+                else:
+                    computer = Computer(str(i), rng.randint(0, 5), rng.randint(0, 9), rng.choice([0.0, 0.5, 1.0]))
+                    routes.append(Route(RouteSeries(computer, rng.choice(routes))))
+            return routes[-1]
+
+        for _ in range(2000):
+            route = random_dag(rng, rng.randint(1, 9))
+            for max_computer_risk in (None, 0.5):
+                virus = OptimalVirus(route, max_computer_risk=max_computer_risk)
+                route.follow_path(virus)
+                expected = best_total((route,), max_computer_risk)
+                self.assertEqual(virus.best_score(), expected)
+                if expected != float("-inf"):
+                    self.assertEqual(sum(c.hacked_value for c in virus.computers), expected)
+
+        self.large_example()
+        virus = OptimalVirus(self.route, score=lambda c: c.hacked_value - 100 * c.risk_factor)
+        self.route.follow_path(virus)
+        # The risky ttb1 -> ttb2 branch is worth more, but not after the risk penalty.
+        self.assertListEqual(virus.computers, [
+            self.l_f, self.l_t1, self.l_t2, self.l_t_t_t_t, self.l_t_t_t_x, self.l_x1, self.l_x2,
+        ])
+        self.assertAlmostEqual(virus.best_score(), 12657)
+
+    @number("2.15")
+    def test_rpn(self):
+        self.assertEqual(compile_rpn("7 3 + 8 - 2 * 2 /").evaluate(), 2.0)
+        self.assertIs(compile_rpn("7 3 + 8 - 2 * 2 /"), compile_rpn("7 3 + 8 - 2 * 2 /"))
+        self.assertTrue(compile_rpn("1.5 -2 *").is_constant)
+        self.assertEqual(compile_rpn("1.5 -2 *").evaluate(), -3.0)
+
+        expression = compile_rpn("hacked_value 2 / hacking_difficulty +")
+        self.assertSetEqual(expression.variables, {"hacked_value", "hacking_difficulty"})
+        computers = [Computer("a", 1, 4, 0.1), Computer("b", 3, 5, 0.2)]
+        self.assertEqual(expression.evaluate(computers[0]), 3.0)
+        self.assertListEqual(expression.evaluate_many(computers), [3.0, 5.5])
+        self.assertRaises(ValueError, expression.evaluate)
+
+        for bad in ["1 +", "1 2", "1 x +", ""]:
+            self.assertRaises(ValueError, lambda: compile_rpn(bad))
+        # Dividing by a constant zero is found while parsing.
+        self.assertRaises(ValueError, lambda: compile_rpn("1 0 /"))
+        self.assertRaises(ValueError, lambda: compile_rpn("1 risk_factor /").evaluate(Computer("z", 0, 0, 0.0)))
+
+        # Thresholds can depend on the computer being looked at.
+        class HalfValueVirus(FancyVirus):
+            CALC_STR = "hacking_difficulty 2 *"
+        self.load_example()
+        virus = HalfValueVirus()
+        self.route.follow_path(virus)
+        # top-top: 3 < 2 * 5, so take the top each time.
+        self.assertListEqual(virus.computers, [self.top_top, self.top_mid, self.final])
+        self.assertListEqual(virus.calculate_thresholds([self.top_top, self.bot_one]), [10.0, 4.0])
+
+    @number("2.16")
+    @unittest.skipIf(np is None, "NumPy is not installed.")
+    def test_select_all_branches(self):
+        rng = random.Random(41)
+        values = [0, 1, 2, 4]
+        risks = [0.0, 0.5, 1.0, 2.0]
+        splits = []
+        for i in range(2000):
+            branches = []
+            for _ in range(2):
+                kind = rng.random()
+                if kind < 0.8:
+                    computer = Computer(str(i), rng.choice(values), rng.choice(values), rng.choice(risks))
+                    branches.append(Route(RouteSeries(computer, Route(None))))
+                elif kind < 0.9:
+                    branches.append(Route(None).add_empty_branch_before())
+                else:
+                    branches.append(Route(None))
+            splits.append(RouteSplit(branches[0], branches[1], Route(None)))
+
+        virus = RiskAverseVirus()
+        expected = [virus.select_branch(split.top, split.bottom).value for split in splits]
+        self.assertListEqual(RiskAverseVirus.select_all_branches(splits).tolist(), expected)
+        # Every rule should have been needed.
+        self.assertSetEqual(set(expected), {d.value for d in BranchDecision})
+        self.assertEqual(len(RiskAverseVirus.select_all_branches([])), 0)
+
+    @number("2.17")
+    def test_shared_routes(self):
+        # Both branches of every split are the same route, and every following ends in the same tail.
+        # As a tree this route would have 2^50 paths.
+        final = Computer("final", 1, 1, 0.1)
+        tail = Route(RouteSeries(final, Route(None)))
+        computers = [Computer(str(i), 1, i, 0.1) for i in range(50)]
+        route = Route(None)
+        for computer in computers:
+            route = Route(RouteSplit(route, route, Route(RouteSeries(computer, tail))))
+
+        # Shared parts count once for every route they are in, but are only visited once.
+        self.assertEqual(route.count_computers(), 2 ** 51 - 2)
+        self.assertEqual(route.count_computers(), route.summary().count)
+        self.assertEqual(len(list(route.iter_distinct_routes())), 50 * 2 + 3)
+        distinct = list(route.iter_computers(distinct=True))
+        self.assertEqual(len(distinct), 51)
+        self.assertSetEqual({id(computer) for computer in distinct}, {id(computer) for computer in computers + [final]})
+        self.assertRaises(ValueError, lambda: list(route.iter_computers("random", distinct=True)))
+        shared = Route(RouteSeries(computers[0], Route(None)))
+        small = Route(RouteSplit(shared, shared, shared))
+        self.assertListEqual(small.add_all_computers(), [computers[0]] * 3)
+        self.assertListEqual(list(small.iter_computers(distinct=True)), [computers[0]])
+        self.assertEqual(small.count_computers(), 3)
+
+        # Interning makes equal parts shared, which doesn't change what is on the route.
+        route_tree = Route(RouteSplit(
+            Route(RouteSeries(Computer("a", 1, 2, 0.5), Route())),
+            Route(RouteSeries(Computer("a", 1, 2, 0.5), Route())),
+            Route(),
+        ))
+        interned = RouteInterner().intern(route_tree)
+        self.assertEqual(interned, route_tree)
+        self.assertListEqual(interned.add_all_computers(), route_tree.add_all_computers())
+        self.assertEqual(interned.count_computers(), 2)
+        self.assertLess(len(route.compile()), 50 * 4)
+
+        for virus_class in (TopVirus, BottomVirus, LazyVirus, RiskAverseVirus):
+            expected = virus_class()
+            route.follow_path(expected)
+            compiled = virus_class()
+            route.compile().follow_path(compiled)
+            self.assertListEqual(compiled.computers, expected.computers)
+        self.assertEqual(len(expected.computers), 100)
+
+        virus = OptimalVirus(route)
+        self.assertEqual(virus.best_score(), sum(range(50)) + 50)
+
+    @number("2.26")
+    def test_route_stepper(self):
+        self.large_example()
+        for virus_class in (TopVirus, BottomVirus, LazyVirus, RiskAverseVirus, FancyVirus):
+            expected = virus_class()
+            self.route.follow_path(expected)
+
+            virus = virus_class()
+            stepper = self.route.compile().stepper(virus)
+            steps = sum(1 for _ in stepper.iter_steps(1))
+            self.assertTrue(stepper.done)
+            self.assertListEqual(virus.computers, expected.computers)
+
+            # Stop after every possible number of steps, save, and carry on from a fresh compile.
+            for stop_after in range(steps + 1):
+                stepper = self.route.compile().stepper(virus_class())
+                stepper.step(stop_after)
+                state = json.loads(json.dumps(stepper.state()))
+                virus = virus_class()
+                resumed = RouteStepper.from_state(self.route.compile(), virus, state)
+                resumed.run()
+                self.assertListEqual(virus.computers, expected.computers)
+
+        # Viruses whose decisions depend on the ones before catch up with skip_branches.
+        for make_virus in (lambda: OptimalVirus(self.route), lambda: ProbabilisticVirus(0.45, 0.45, seed=7)):
+            expected = make_virus()
+            self.route.follow_path(expected)
+            steps = sum(1 for _ in self.route.compile().stepper(make_virus()).iter_steps(1))
+            for stop_after in range(steps + 1):
+                stepper = self.route.compile().stepper(make_virus())
+                stepper.step(stop_after)
+                state = json.loads(json.dumps(stepper.state()))
+                virus = make_virus()
+                RouteStepper.from_state(self.route.compile(), virus, state).run()
+                self.assertListEqual(virus.computers, expected.computers)
+
+        with self.assertRaises(ValueError):
+            RouteStepper.from_state(Route(None).compile(), TopVirus(), state)
@@ -1,22 +1,62 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
+import asyncio
+import random
+from typing import Awaitable, Callable, Iterable, Iterator
+from algorithms.rpn import compile_rpn
 from computer import Computer
-from route import Route, RouteSeries
+from result_sinks import Sink
+from route import Route, RouteSeries, RouteSplit
 from branch_decision import BranchDecision
 
+try:
+    import numpy as np
+except ImportError:
+    # Only needed for the batch methods.
+    np = None
 
-class VirusType(ABC):
 
-    def __init__(self) -> None:
-        self.computers = []
+class VirusBase(ABC):
+    """
+    What every virus has: the computers it adds, kept in a sink (see result_sinks).
+    Viruses subclass VirusType, or AsyncVirusType if their decisions need to wait.
+    """
+
+    def __init__(self, sink: Sink | None = None) -> None:
+        """
+        :param sink: where added computers go, a new list by default.
+        """
+        self.computers = sink if sink is not None else []
 
     def add_computer(self, computer: Computer) -> None:
         self.computers.append(computer)
 
+
+class VirusType(VirusBase):
+
     @abstractmethod
     def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
         raise NotImplementedError()
 
+    def skip_branches(self, decided: list[tuple[Route, Route, BranchDecision]]) -> None:
+        """
+        Called when a path is carried on part way through (see compiled_route.RouteStepper.from_state),
+        with the (top, bottom, decision) of each split already decided, in order, instead of
+        asking select_branch about them again. Viruses whose decisions depend on the ones
+        before should catch up here. Does nothing by default.
+        """
+
+
+class AsyncVirusType(VirusBase):
+    """
+    A virus whose branch decisions may need to wait, e.g. on I/O.
+    Followed with `await route.afollow_path(virus_type)`, see async_traversal.
+    """
+
+    @abstractmethod
+    async def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+        raise NotImplementedError()
+
 
 class TopVirus(VirusType):
     def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
@@ -56,6 +96,53 @@ class LazyVirus(VirusType):
         return BranchDecision.TOP
 
 
+class ProbabilisticVirus(VirusType):
+    """
+    Takes the top branch with probability top_probability, the bottom branch
+    with bottom_probability, and otherwise stops.
+    Subclasses can make the chances depend on the branches by overriding branch_probabilities.
+    Many trials can be run at once with monte_carlo.simulate_trials.
+    """
+
+    def __init__(
+        self,
+        top_probability: float = 0.5,
+        bottom_probability: float = 0.5,
+        seed: int | None = None,
+        sink: Sink | None = None,
+    ) -> None:
+        """
+        :raises ValueError: when a probability is negative, or they add up to more than 1.
+        """
+        super().__init__(sink)
+        if top_probability < 0 or bottom_probability < 0 or top_probability + bottom_probability > 1:
+            raise ValueError("Probabilities should be at least 0 and add up to at most 1.")
+        self.top_probability = top_probability
+        self.bottom_probability = bottom_probability
+        self.random = random.Random(seed)
+
+    def branch_probabilities(self, top_branch: Route, bottom_branch: Route) -> tuple[float, float]:
+        """The chances of taking the top and the bottom branch."""
+        return self.top_probability, self.bottom_probability
+
+    def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+        top_probability, bottom_probability = self.branch_probabilities(top_branch, bottom_branch)
+        draw = self.random.random()
+        if draw < top_probability:
+            return BranchDecision.TOP
+        elif draw < top_probability + bottom_probability:
+            return BranchDecision.BOTTOM
+        return BranchDecision.STOP
+
+    def skip_branches(self, decided: list[tuple[Route, Route, BranchDecision]]) -> None:
+        """
+        Makes the draw select_branch would have made for each split,
+        so the rest of the path is the same as if it had never been paused.
+        """
+        for _ in decided:
+            self.random.random()
+
+
 class RiskAverseVirus(VirusType):
     def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
         """
@@ -116,6 +203,97 @@ class RiskAverseVirus(VirusType):
             return BranchDecision.BOTTOM
         return BranchDecision.TOP
 
+    @staticmethod
+    def computer_columns(computers: list[Computer]) -> dict[str, np.ndarray]:
+        """
+        The attributes of the computers as NumPy arrays, for select_branches.
+
+        :raises ImportError: when NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("NumPy is needed for batch branch selection.")
+        return {
+            "hacking_difficulty": np.array([c.hacking_difficulty for c in computers], dtype=float),
+            "hacked_value": np.array([c.hacked_value for c in computers], dtype=float),
+            "risk_factor": np.array([c.risk_factor for c in computers], dtype=float),
+        }
+
+    @staticmethod
+    def select_branches(top: dict[str, np.ndarray], bottom: dict[str, np.ndarray]) -> np.ndarray:
+        """
+        The decision for many splits at once, where both branches start with a computer.
+
+        top and bottom hold the columns of the first computer on each branch
+        (see computer_columns). Returns the BranchDecision value for each split,
+        exactly as select_branch would decide.
+
+        :complexity: O(N) where N is the number of splits, with no Python loop.
+        :raises ImportError: when NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("NumPy is needed for batch branch selection.")
+        top_difficulty = np.asarray(top["hacking_difficulty"], dtype=float)
+        bot_difficulty = np.asarray(bottom["hacking_difficulty"], dtype=float)
+        top_risk = np.asarray(top["risk_factor"], dtype=float)
+        bot_risk = np.asarray(bottom["risk_factor"], dtype=float)
+        top_zero = top_risk == 0.0
+        bot_zero = bot_risk == 0.0
+        both_zero = top_zero & bot_zero
+        neither_zero = ~top_zero & ~bot_zero
+
+        top_coef = np.maximum(top_difficulty, 0.5 * np.asarray(top["hacked_value"], dtype=float))
+        bot_coef = np.maximum(bot_difficulty, 0.5 * np.asarray(bottom["hacked_value"], dtype=float))
+        # Only divide where neither risk is zero, every other case is decided before this.
+        top_coef = np.where(neither_zero, top_coef / np.where(neither_zero, top_risk, 1.0), top_coef)
+        bot_coef = np.where(neither_zero, bot_coef / np.where(neither_zero, bot_risk, 1.0), bot_coef)
+
+        # Same order as the checks in select_branch, the first that holds is taken.
+        top_value = BranchDecision.TOP.value
+        bot_value = BranchDecision.BOTTOM.value
+        return np.select(
+            [
+                top_zero & ~bot_zero,
+                bot_zero & ~top_zero,
+                both_zero & (top_difficulty > bot_difficulty),
+                both_zero & (top_difficulty < bot_difficulty),
+                top_coef > bot_coef,
+                bot_coef > top_coef,
+                top_risk < bot_risk,
+                top_risk > bot_risk,
+            ],
+            [top_value, bot_value, top_value, bot_value, top_value, bot_value, top_value, bot_value],
+            default=BranchDecision.STOP.value,
+        )
+
+    @classmethod
+    def select_all_branches(cls, splits: list[RouteSplit]) -> np.ndarray:
+        """
+        The BranchDecision value for every split, as select_branch would decide.
+
+        Splits where both branches start with a computer are decided together
+        with select_branches, the rest by which branch starts with a computer.
+
+        :complexity: O(N) where N is the number of splits.
+        :raises ImportError: when NumPy is not installed.
+        """
+        if np is None:
+            raise ImportError("NumPy is needed for batch branch selection.")
+        decisions = np.full(len(splits), BranchDecision.TOP.value)
+        both = []
+        for i, split in enumerate(splits):
+            top_route = type(split.top.store) == RouteSeries
+            bot_route = type(split.bottom.store) == RouteSeries
+            if top_route and bot_route:
+                both.append(i)
+            elif top_route:
+                decisions[i] = BranchDecision.BOTTOM.value
+
+        if len(both):
+            top = cls.computer_columns([splits[i].top.store.computer for i in both])
+            bottom = cls.computer_columns([splits[i].bottom.store.computer for i in both])
+            decisions[both] = cls.select_branches(top, bottom)
+        return decisions
+
 
 class FancyVirus(VirusType):
     CALC_STR = "7 3 + 8 - 2 * 2 /"
@@ -129,10 +307,11 @@ class FancyVirus(VirusType):
 
         if top_route and bot_route:
             
-            threshold = self.calculate_threshold()
-            if (top_branch.store.computer.hacked_value < threshold):
+            top_comp = top_branch.store.computer
+            bot_comp = bottom_branch.store.computer
+            if (top_comp.hacked_value < self.calculate_threshold(top_comp)):
                 return BranchDecision.TOP
-            elif (bottom_branch.store.computer.hacked_value < threshold):
+            elif (bot_comp.hacked_value < self.calculate_threshold(bot_comp)):
                 return BranchDecision.BOTTOM
             else:
                 return BranchDecision.STOP
@@ -144,35 +323,192 @@ class FancyVirus(VirusType):
         return BranchDecision.TOP
     
 
-    def calculate_threshold(self) -> float:
-        """
-        Calculates the threshold by CALC_STR with reverse polish notation
-        """
-
-        chars = self.CALC_STR.split()
-        char_stack = []
-        
-        for char in chars:
-            if char.isdigit():  
-                # number push to the stack
-                char_stack.append(float(char)) 
-            else: 
-                # there should be 2 operands
-                b = char_stack.pop() 
-                a = char_stack.pop() 
-
-                if char == '+':
-                    char_stack.append(a + b)
-                elif char == '-':
-                    char_stack.append(a - b)
-                elif char == '*':
-                    char_stack.append(a * b)
-                elif char == '/':
-                    if b == 0:
-                        # If this happen, sth is wrong.
-                        raise ValueError("Zero Division.")
-                    char_stack.append(a / b)
-                    
-        
-        result = char_stack.pop()
-        return result
+    def calculate_threshold(self, computer: Computer | None = None) -> float:
+        """
+        Calculates the threshold by CALC_STR with reverse polish notation.
+
+        CALC_STR is only parsed the first time it is seen (see algorithms.rpn),
+        and may use the attributes of the computer being compared as variables.
+        """
+        return compile_rpn(self.CALC_STR).evaluate(computer)
+
+    def calculate_thresholds(self, computers: Iterable[Computer]) -> list[float]:
+        """
+        Calculates the threshold for each computer, parsing CALC_STR at most once.
+        """
+        return compile_rpn(self.CALC_STR).evaluate_many(computers)
+
+
+class OptimalVirus(VirusType):
+    """
+    Takes the path through a route with the highest total score.
+
+    Each computer scores score(computer), by default its hacked_value.
+    Computers with a risk_factor over max_computer_risk are never entered, stopping
+    at an earlier split if that is the only way to avoid them. This caps the risk
+    of each computer on its own, it is not a budget for the total risk of the path,
+    which would need the best score of every sub-route for every remaining budget.
+
+    The best scores of every sub-route are worked out when the virus is made,
+    and each split is decided from them as the path reaches it, so the virus
+    should follow the route it was made for, once.
+    """
+
+    def __init__(
+        self,
+        route: Route,
+        score: Callable[[Computer], float] | None = None,
+        max_computer_risk: float | None = None,
+        sink: Sink | None = None,
+    ) -> None:
+        """
+        :complexity: O(N) where N is the number of distinct nodes in the route,
+        then O(P) over the path taken, the same as following it.
+        """
+        super().__init__(sink)
+        self.score = score if score is not None else (lambda computer: computer.hacked_value)
+        self.max_computer_risk = max_computer_risk
+        # Best scores for each sub-route (by id): following it to the end, and stopping part way.
+        self.full_scores: dict[int, float] = {}
+        self.stop_scores: dict[int, float] = {}
+        self.route = route
+        self._score_routes(route)
+        # Decisions are worked out as the path reaches them, see _plan.
+        self._decisions = self._plan(route)
+
+    def _computer_score(self, computer: Computer) -> float:
+        if self.max_computer_risk is not None and computer.risk_factor > self.max_computer_risk:
+            return float("-inf")
+        return self.score(computer)
+
+    def _score_routes(self, route: Route) -> None:
+        """Fills in full_scores and stop_scores for every sub-route, bottom up."""
+        full = self.full_scores
+        stop = self.stop_scores
+        stack = [(route, False)]
+
+        while len(stack):
+            current, children_done = stack.pop()
+            if id(current) in full:
+                continue
+            store = current.store
+
+            if store is None:
+                full[id(current)] = 0
+                stop[id(current)] = float("-inf")
+                continue
+
+            if isinstance(store, RouteSplit):
+                children = [store.top, store.bottom, store.following]
+            else:
+                children = [store.following]
+
+            if not children_done:
+                stack.append((current, True))
+                for child in children:
+                    if id(child) not in full:
+                        stack.append((child, False))
+
+            elif isinstance(store, RouteSplit):
+                best_branch = max(full[id(store.top)], full[id(store.bottom)])
+                full[id(current)] = best_branch + full[id(store.following)]
+                # Stopping here is worth nothing more.
+                stop[id(current)] = max(
+                    0,
+                    stop[id(store.top)],
+                    stop[id(store.bottom)],
+                    best_branch + stop[id(store.following)],
+                )
+
+            else:
+                computer_score = self._computer_score(store.computer)
+                full[id(current)] = computer_score + full[id(store.following)]
+                stop[id(current)] = computer_score + stop[id(store.following)]
+
+    def _value(self, route: Route, after: float) -> float:
+        """Best score from the start of route, when finishing it is worth `after` more."""
+        return max(self.full_scores[id(route)] + after, self.stop_scores[id(route)])
+
+    def _plan(self, route: Route) -> Iterator[tuple[Route, Route, BranchDecision]]:
+        """
+        Yields (top, bottom, decision) for each split on the best path, in the order
+        follow_path reaches them. Each split is decided knowing what comes after it
+        on this path, which differs between uses of a route shared by several others.
+        """
+        pending = [(route, 0)]
+
+        while len(pending):
+            current, after = pending.pop()
+            store = current.store
+
+            while store is not None:
+                if isinstance(store, RouteSeries):
+                    store = store.following.store
+                    continue
+
+                after_branch = self._value(store.following, after)
+                top_value = self._value(store.top, after_branch)
+                bottom_value = self._value(store.bottom, after_branch)
+                if top_value >= bottom_value and top_value >= 0:
+                    decision = BranchDecision.TOP
+                elif bottom_value >= 0:
+                    decision = BranchDecision.BOTTOM
+                else:
+                    decision = BranchDecision.STOP
+                yield store.top, store.bottom, decision
+
+                if decision == BranchDecision.STOP:
+                    return
+                pending.append((store.following, after))
+                store = (store.top if decision == BranchDecision.TOP else store.bottom).store
+                after = after_branch
+
+    def best_score(self) -> float:
+        """The total score of the path this virus takes (-inf if every path enters a risky computer)."""
+        return self._value(self.route, 0)
+
+    def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+        """
+        Take the branch planned for the next split on the path.
+
+        :raises ValueError: when the split is not the next one on the planned path.
+        """
+        top, bottom, decision = next(self._decisions, (None, None, BranchDecision.STOP))
+        if top is not top_branch or bottom is not bottom_branch:
+            raise ValueError("OptimalVirus should follow the route it was made for, once.")
+        return decision
+
+    def skip_branches(self, decided: list[tuple[Route, Route, BranchDecision]]) -> None:
+        """
+        Moves past the splits already decided on the planned path.
+
+        :raises ValueError: when they are not the next splits on the planned path, as planned.
+        """
+        for top_branch, bottom_branch, decision in decided:
+            if self.select_branch(top_branch, bottom_branch) != decision:
+                raise ValueError("OptimalVirus should follow the route it was made for, once.")
+
+
+class ThreatScoreVirus(AsyncVirusType):
+    """
+    Asks a scorer for the current threat score of the first computer on each
+    branch (both at once), and takes the branch with the lower score.
+    A branch without a computer scores 0, and on a tie the virus stops.
+    """
+
+    def __init__(self, scorer: Callable[[Computer], Awaitable[float]], sink: Sink | None = None) -> None:
+        super().__init__(sink)
+        self.scorer = scorer
+
+    async def _score(self, branch: Route) -> float:
+        if isinstance(branch.store, RouteSeries):
+            return await self.scorer(branch.store.computer)
+        return 0
+
+    async def select_branch(self, top_branch: Route, bottom_branch: Route) -> BranchDecision:
+        top_score, bottom_score = await asyncio.gather(self._score(top_branch), self._score(bottom_branch))
+        if top_score < bottom_score:
+            return BranchDecision.TOP
+        elif bottom_score < top_score:
+            return BranchDecision.BOTTOM
+        return BranchDecision.STOP